@@ -5,6 +5,11 @@ from pathlib import Path
 
 from src.config import DB_PATH
 
+# sqlite3 keeps 128 prepared statements per connection by default; the
+# scrapers' multi-row INSERTs (one SQL string per chunk size) plus ad-hoc
+# queries on the shared connection can churn that, so keep more.
+STATEMENT_CACHE_SIZE = 256
+
 SCHEMA_SQL = """
 CREATE TABLE IF NOT EXISTS countries (
     code        TEXT PRIMARY KEY,
@@ -88,7 +93,10 @@ def connect(db_path=None):
             db_path.parent.mkdir(parents=True, exist_ok=True)
             shutil.copy2(str(old_path), str(db_path))
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(db_path), check_same_thread=False, timeout=60)
+    conn = sqlite3.connect(
+        str(db_path), check_same_thread=False, timeout=60,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
     conn.execute("PRAGMA journal_mode=WAL")
     conn.execute("PRAGMA busy_timeout=30000")
     conn.execute("PRAGMA foreign_keys=ON")
@@ -155,11 +163,22 @@ def _migrate(conn):
     if "airline" not in cols_s:
         conn.execute("ALTER TABLE schedules ADD COLUMN airline TEXT NOT NULL DEFAULT 'FR'")
         conn.commit()
+    # Created here rather than in SCHEMA_SQL: they need the airline columns.
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_schedules_route_scraped"
+        " ON schedules(airline, origin, destination, scraped_at)"
+    )
+    conn.commit()
 
     cols_f = {r[1] for r in conn.execute("PRAGMA table_info(fares)")}
     if "airline" not in cols_f:
         conn.execute("ALTER TABLE fares ADD COLUMN airline TEXT NOT NULL DEFAULT 'FR'")
         conn.commit()
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_fares_route_date"
+        " ON fares(origin, destination, departure_date, price, currency, airline)"
+    )
+    conn.commit()
 
 
 def table_counts(conn):
@@ -5,7 +5,6 @@ connections (routes), so both airports and routes are handled here.
 """
 
 import logging
-import sqlite3
 from datetime import datetime, timezone
 
 from src.scraper.wizzair.api import wizzair_get
@@ -30,70 +29,69 @@ def scrape_airports(conn):
     log.info("[%s] Filtering out %d fake/MAC stations: %s", AIRLINE, len(fake_iatas), sorted(fake_iatas))
 
     airports = []
-    countries_seen = set()
-    route_count = 0
+    countries = {}
+    airport_rows = []
+    route_rows = []
     now = datetime.now(timezone.utc).isoformat()
 
-    # Pass 1: insert all airports so FK references are satisfied.
-    for city in cities:
-        iata = city.get("iata", "").strip()
-        if not iata or iata in fake_iatas:
-            continue
+    # Strip and filter IATA codes once; both passes reuse the result.
+    clean_cities = [
+        (city, iata)
+        for city, iata in ((c, c.get("iata", "").strip()) for c in cities)
+        if iata and iata not in fake_iatas
+    ]
 
+    # Pass 1: collect airports (and their countries).
+    for city, iata in clean_cities:
         cc = (city.get("countryCode") or "").upper()
-        country_name = city.get("countryName", "")
-        currency = city.get("currencyCode", "")
-
-        if cc and cc not in countries_seen:
-            conn.execute(
-                "INSERT OR REPLACE INTO countries (code, name, currency) "
-                "VALUES (?, ?, ?)",
-                (cc, country_name, currency),
+        if cc and cc not in countries:
+            countries[cc] = (
+                cc, city.get("countryName", ""), city.get("currencyCode", ""),
             )
-            countries_seen.add(cc)
 
-        lat = city.get("latitude")
-        lon = city.get("longitude")
         name = city.get("shortName", "")
-
-        conn.execute(
-            """INSERT OR REPLACE INTO airports
-               (iata_code, name, city, country_code, latitude, longitude, timezone)
-               VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (iata, name, name, cc, lat, lon, ""),
-        )
+        airport_rows.append((
+            iata, name, name, cc, city.get("latitude"), city.get("longitude"), "",
+        ))
         airports.append(iata)
 
-    conn.commit()
-
-    # Pass 2: insert routes (all destination airports now exist).
-    for city in cities:
-        iata = city.get("iata", "").strip()
-        if not iata or iata in fake_iatas:
-            continue
-
+    # Pass 2: collect routes whose destination is a known airport (from
+    # this map or already in the DB), so the routes FK cannot fail halfway
+    # through the batch.
+    known = set(airports)
+    known.update(r[0] for r in conn.execute("SELECT iata_code FROM airports"))
+    for city, iata in clean_cities:
         for conn_info in city.get("connections", []):
             dest = conn_info.get("iata", "").strip()
-            if not dest or dest in fake_iatas:
+            if not dest or dest in fake_iatas or dest not in known:
                 continue
             is_new = 1 if conn_info.get("isNew") else 0
             connecting = 1 if conn_info.get("isConnected") else 0
-            try:
-                conn.execute(
-                    """INSERT INTO routes (origin, destination, airline, is_connecting, new_route, last_seen)
-                       VALUES (?, ?, ?, ?, ?, ?)
-                       ON CONFLICT(origin, destination, airline)
-                       DO UPDATE SET is_connecting = excluded.is_connecting,
-                                     new_route = excluded.new_route,
-                                     last_seen = excluded.last_seen""",
-                    (iata, dest, AIRLINE, connecting, is_new, now),
-                )
-                route_count += 1
-            except sqlite3.IntegrityError:
-                pass
-
-    conn.commit()
-    log.info("[%s] Stored %d airports and %d routes.", AIRLINE, len(airports), route_count)
+            route_rows.append((iata, dest, AIRLINE, connecting, is_new, now))
+
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO countries (code, name, currency) "
+            "VALUES (?, ?, ?)",
+            countries.values(),
+        )
+        conn.executemany(
+            """INSERT OR REPLACE INTO airports
+               (iata_code, name, city, country_code, latitude, longitude, timezone)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            airport_rows,
+        )
+        conn.executemany(
+            """INSERT INTO routes (origin, destination, airline, is_connecting, new_route, last_seen)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(origin, destination, airline)
+               DO UPDATE SET is_connecting = excluded.is_connecting,
+                             new_route = excluded.new_route,
+                             last_seen = excluded.last_seen""",
+            route_rows,
+        )
+
+    log.info("[%s] Stored %d airports and %d routes.", AIRLINE, len(airports), len(route_rows))
     return airports
 
 
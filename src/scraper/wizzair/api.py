@@ -8,6 +8,7 @@ Provides both a stateless WizzairSession class for parallel scraping
 and legacy module-level functions for simple single-threaded use.
 """
 
+import functools
 import logging
 import random
 import re
@@ -15,6 +16,12 @@ import threading
 import time
 
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson as _json
+except ImportError:  # pragma: no cover - orjson is optional
+    import json as _json
 
 from src.config import MAX_RETRIES, RETRY_BACKOFF
 
@@ -37,20 +44,64 @@ _HEADERS = {
 _POST_RETRIES = 8
 _POST_DELAY = 0.4
 
-_throttle_lock = threading.Lock()
-_last_request_time = 0.0
-_MIN_INTERVAL = 0.5
+# Matched against the raw homepage bytes to skip decoding the whole page.
+_API_URL_RE = re.compile(rb'"apiUrl"\s*:\s*"([^"]+)"')
+
+# Keep-alive pool per session; retries are handled in post()/get().
+_POOL_CONNECTIONS = 16
+_POOL_MAXSIZE = 64
+
+# Discovered API base shared by all sessions: (base_url, discovered_at).
+_API_BASE_TTL = 3600
+_api_base_lock = threading.Lock()
+_cached_api_base = None
+
+# Shared request budget for be.wizzair.com: bursts of up to
+# _BUCKET_CAPACITY requests, refilled at _BUCKET_RATE requests/second.
+_BUCKET_CAPACITY = 8
+_BUCKET_RATE = 4.0
+
+
+def _invalidate_api_base():
+    """Forget the shared API base so the next session rediscovers it."""
+    global _cached_api_base
+    with _api_base_lock:
+        _cached_api_base = None
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter.
 
+    The lock is only held while updating the token count; a caller that
+    finds the bucket empty sleeps outside the lock until the next token,
+    so workers are not serialized behind each other's waits.
+    """
 
-def _throttle():
-    """Global rate limiter: ensures at least _MIN_INTERVAL between requests."""
-    global _last_request_time
-    with _throttle_lock:
-        now = time.time()
-        wait = _MIN_INTERVAL - (now - _last_request_time)
-        if wait > 0:
+    def __init__(self, capacity, refill_rate):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated) * self.refill_rate,
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.refill_rate
             time.sleep(wait)
-        _last_request_time = time.time()
+
+
+_rate_limiter = TokenBucket(_BUCKET_CAPACITY, _BUCKET_RATE)
 
 
 class WizzairSession:
@@ -69,22 +120,42 @@ class WizzairSession:
         if self._session is None:
             self._session = requests.Session()
             self._session.headers.update(_HEADERS)
+            adapter = HTTPAdapter(
+                pool_connections=_POOL_CONNECTIONS,
+                pool_maxsize=_POOL_MAXSIZE,
+                max_retries=0,
+            )
+            self._session.mount("https://", adapter)
+
+    def _clear_state(self):
+        """Drop cookies and CSRF token but keep the pooled connections."""
+        self._session.cookies.clear()
+        self._session.headers.pop("X-RequestVerificationToken", None)
 
     def _reset(self):
         self._session = None
         self._api_base = None
 
     def _discover_api(self):
-        self._ensure_session()
-        resp = self._session.get(
-            _HOMEPAGE_URL, headers={"Accept": "text/html"}, timeout=30
-        )
-        resp.raise_for_status()
-        match = re.search(r'"apiUrl"\s*:\s*"([^"]+)"', resp.text)
-        if match:
-            self._api_base = match.group(1).replace("\\u002F", "/")
-        if self._api_base is None:
-            raise RuntimeError("Could not discover Wizzair API URL")
+        global _cached_api_base
+        # Holding the lock across the fetch makes concurrent sessions wait
+        # for one homepage GET instead of each doing their own.
+        with _api_base_lock:
+            if (_cached_api_base is not None
+                    and time.time() - _cached_api_base[1] < _API_BASE_TTL):
+                self._api_base = _cached_api_base[0]
+                return
+            self._ensure_session()
+            resp = self._session.get(
+                _HOMEPAGE_URL, headers={"Accept": "text/html"}, timeout=30
+            )
+            resp.raise_for_status()
+            match = _API_URL_RE.search(resp.content)
+            if match:
+                self._api_base = match.group(1).decode().replace("\\u002F", "/")
+            if self._api_base is None:
+                raise RuntimeError("Could not discover Wizzair API URL")
+            _cached_api_base = (self._api_base, time.time())
         log.debug("[W6-w%d] API base: %s", self.worker_id, self._api_base)
 
     def _base(self):
@@ -103,15 +174,17 @@ class WizzairSession:
         url = f"{base}/{path.lstrip('/')}"
         self._ensure_session()
         sess = self._session
+        bad_requests = 0
 
         for attempt in range(1, _POST_RETRIES + 1):
             try:
-                _throttle()
-                resp = sess.post(url, json=payload, timeout=30)
+                _rate_limiter.acquire()
+                # Content-Type is already set in _HEADERS.
+                resp = sess.post(url, data=_json.dumps(payload), timeout=30)
 
                 if resp.status_code == 200:
                     self._sync_token()
-                    return resp.json()
+                    return _json.loads(resp.content)
 
                 if resp.status_code in (429, 503):
                     jitter = random.uniform(0, 5)
@@ -120,28 +193,31 @@ class WizzairSession:
                         "[W6-w%d] %d - backing off %.0fs (attempt %d)",
                         self.worker_id, resp.status_code, wait, attempt,
                     )
-                    self._session = None
+                    self._clear_state()
                     time.sleep(wait)
-                    self._ensure_session()
-                    sess = self._session
                     continue
 
                 if resp.status_code == 404:
                     return None
 
                 if resp.status_code == 400 and attempt < _POST_RETRIES:
-                    log.debug("[W6-w%d] 400 refreshing session", self.worker_id)
-                    self._session = None
+                    bad_requests += 1
                     time.sleep(2)
-                    self._ensure_session()
-                    sess = self._session
+                    if bad_requests == 1:
+                        log.debug("[W6-w%d] 400 clearing session state", self.worker_id)
+                        self._clear_state()
+                    else:
+                        log.debug("[W6-w%d] 400 refreshing session", self.worker_id)
+                        self._session = None
+                        self._ensure_session()
+                        sess = self._session
                     continue
 
                 log.warning(
                     "[W6-w%d] HTTP %d (attempt %d)",
                     self.worker_id, resp.status_code, attempt,
                 )
-            except requests.RequestException as exc:
+            except (requests.RequestException, ValueError) as exc:
                 log.warning(
                     "[W6-w%d] POST error: %s (attempt %d)",
                     self.worker_id, exc, attempt,
@@ -152,6 +228,10 @@ class WizzairSession:
 
         log.error("[W6-w%d] POST failed after %d attempts: %s",
                   self.worker_id, _POST_RETRIES, url)
+        if bad_requests:
+            # Persistent 400s usually mean the versioned API path moved on.
+            _invalidate_api_base()
+            self._api_base = None
         return None
 
     def get(self, path, params=None):
@@ -163,10 +243,10 @@ class WizzairSession:
 
         for attempt in range(1, MAX_RETRIES + 1):
             try:
-                time.sleep(1.0)
+                _rate_limiter.acquire()
                 resp = sess.get(url, params=params, timeout=30)
                 if resp.status_code == 200:
-                    return resp.json()
+                    return _json.loads(resp.content)
                 if resp.status_code == 429:
                     wait = RETRY_BACKOFF * attempt
                     log.warning("[W6-w%d] 429 waiting %ds", self.worker_id, wait)
@@ -176,7 +256,7 @@ class WizzairSession:
                     return None
                 log.warning("[W6-w%d] HTTP %d (attempt %d)",
                             self.worker_id, resp.status_code, attempt)
-            except requests.RequestException as exc:
+            except (requests.RequestException, ValueError) as exc:
                 log.warning("[W6-w%d] error: %s (attempt %d)",
                             self.worker_id, exc, attempt)
             if attempt < MAX_RETRIES:
@@ -190,17 +270,14 @@ class WizzairSession:
 # Legacy module-level functions (used by airports.py and other single-thread
 # callers). Delegates to a default WizzairSession instance.
 # ---------------------------------------------------------------------------
-_default_session = None
-
-
+@functools.cache
 def _get_default():
-    global _default_session
-    if _default_session is None:
-        _default_session = WizzairSession(worker_id=0)
-    return _default_session
+    return WizzairSession(worker_id=0)
 
 
 def get_api_base():
+    # Not cached here: the base has a TTL and is invalidated on stale-path
+    # failures, see _discover_api().
     return _get_default()._base()
 
 
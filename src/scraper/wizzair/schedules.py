@@ -4,16 +4,21 @@ The endpoint accepts 42-day windows and returns flights with prices.
 Both outbound (A->B) and return (B->A) are requested in a single call,
 halving the total number of API requests.
 
-Uses N parallel sessions (default 4) to multiply throughput without
-triggering rate limits.  Workers only do HTTP; all DB writes happen in
-a single dedicated writer thread via a queue (avoids SQLite locking).
+Uses a pool of N parallel sessions (default 4) to multiply throughput
+without triggering rate limits.  Route pairs are dispatched to the pool
+one at a time, so every session stays busy until the last pair is done.
+Workers only do HTTP; all DB writes happen in a single dedicated writer
+thread via a queue (avoids SQLite locking).
 
 Incremental mode (default): only re-scrapes routes whose data is older
 than `days_fresh` days.
 """
 
+import functools
+import itertools
 import logging
 import queue
+import sqlite3
 import threading
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -30,43 +35,79 @@ DEFAULT_WORKERS = 4
 
 _SENTINEL = None
 
+_thread_state = threading.local()
+
+INSERT_SCHED_SQL = """INSERT OR REPLACE INTO schedules
+    (origin, destination, airline, year, month, day,
+     flight_number, departure_time, arrival_time,
+     carrier, scraped_at)
+    VALUES (?,?,?,?,?,?,?,?,?,?,?)"""
+
+INSERT_FARE_SQL = """INSERT OR REPLACE INTO fares
+    (origin, destination, airline, departure_date,
+     arrival_date, price, currency, flight_number,
+     scraped_at)
+    VALUES (?,?,?,?,?,?,?,?,?)"""
+
+# Rows per multi-row INSERT, further capped so one statement stays under
+# SQLite's historical 999 bound-parameter limit (90 rows for schedules).
+ROWS_PER_STMT = 100
+_MAX_SQL_PARAMS = 999
+
+# Schedule rows the writer coalesces from the queue before committing.
+BATCH_ROWS = 5000
+
+# Seconds between background WAL checkpoints while the writer is running.
+CHECKPOINT_INTERVAL = 30
+
+
+def _route_pairs(conn, days_fresh):
+    """Return undirected (a, b) route pairs to scrape.
+
+    Both directions of a route collapse to one (min, max) pair in SQL,
+    since every timetable request covers A->B and B->A.  With
+    days_fresh > 0, only pairs with a direction that has no schedule data
+    or data older than days_fresh are returned; the freshness check is an
+    index-only probe on idx_schedules_route_scraped.
+    """
+    if days_fresh <= 0:
+        return conn.execute(
+            """SELECT MIN(origin, destination) AS a, MAX(origin, destination) AS b
+               FROM routes
+               WHERE airline = ?
+               GROUP BY a, b""",
+            (AIRLINE,),
+        ).fetchall()
 
-def _stale_routes(conn, days_fresh):
-    """Return routes that have no schedule data or data older than days_fresh."""
     cutoff = (datetime.utcnow() - timedelta(days=days_fresh)).isoformat()
-    rows = conn.execute(
-        """SELECT r.origin, r.destination
+    return conn.execute(
+        """SELECT MIN(r.origin, r.destination) AS a,
+                  MAX(r.origin, r.destination) AS b
            FROM routes r
-           LEFT JOIN (
-               SELECT origin, destination, MAX(scraped_at) AS last
-               FROM schedules
-               WHERE airline = ?
-               GROUP BY origin, destination
-           ) s ON r.origin = s.origin AND r.destination = s.destination
            WHERE r.airline = ?
-             AND (s.last IS NULL OR s.last < ?)""",
+             AND NOT EXISTS (
+                 SELECT 1 FROM schedules s
+                 WHERE s.airline = ?
+                   AND s.origin = r.origin
+                   AND s.destination = r.destination
+                   AND s.scraped_at >= ?
+             )
+           GROUP BY a, b""",
         (AIRLINE, AIRLINE, cutoff),
     ).fetchall()
-    return rows
-
-
-def _pair_routes(routes):
-    """Group directed routes into undirected pairs for bidirectional requests."""
-    seen = set()
-    pairs = []
-    for a, b in routes:
-        key = (min(a, b), max(a, b))
-        if key in seen:
-            continue
-        seen.add(key)
-        pairs.append((a, b))
-    return pairs
-
-
-def _parse_flights(flights, origin, dest, scraped_at):
-    """Parse flight entries into (sched_rows, fare_rows) lists."""
-    sched_rows = []
-    fare_rows = []
+
+
+def _parse_flights(flights, origin, dest, scraped_at,
+                   sched_rows=None, fare_rows=None):
+    """Parse flight entries into (sched_rows, fare_rows) lists.
+
+    Rows are appended to the given lists when passed, so both directions
+    of a timetable response can share one pair of lists.
+    """
+    if sched_rows is None:
+        sched_rows = []
+    if fare_rows is None:
+        fare_rows = []
     if not flights:
         return sched_rows, fare_rows
 
@@ -77,21 +118,23 @@ def _parse_flights(flights, origin, dest, scraped_at):
         currency = price_info.get("currencyCode", "EUR")
 
         for dep_dt in dep_dates:
-            parts = dep_dt.split("T")
-            if len(parts) != 2:
+            # Fixed "YYYY-MM-DDTHH:MM:SS" layout: slice instead of strptime.
+            if len(dep_dt) < 16 or dep_dt[10] != "T":
                 continue
-            date_part = parts[0]
-            time_part = parts[1]
+            date_part = dep_dt[:10]
+            time_part = dep_dt[11:]
 
             try:
-                dt = datetime.strptime(date_part, "%Y-%m-%d")
+                year = int(dep_dt[0:4])
+                month = int(dep_dt[5:7])
+                day = int(dep_dt[8:10])
             except ValueError:
                 continue
 
-            flight_id = "W6-" + time_part.replace(":", "")[:4]
+            flight_id = "W6-" + time_part[:2] + time_part[3:5]
 
             sched_rows.append((
-                origin, dest, AIRLINE, dt.year, dt.month, dt.day,
+                origin, dest, AIRLINE, year, month, day,
                 flight_id, time_part, "", "W6", scraped_at,
             ))
 
@@ -104,59 +147,130 @@ def _parse_flights(flights, origin, dest, scraped_at):
     return sched_rows, fare_rows
 
 
+@functools.lru_cache(maxsize=None)
+def _multi_row_sql(sql, n_rows):
+    """Expand a single-row ``INSERT ... VALUES (?,...)`` to n_rows tuples."""
+    head, _, row_sql = sql.rpartition("VALUES")
+    return head + "VALUES " + ",".join([row_sql.strip()] * n_rows)
+
+
+def _insert_rows(conn, sql, rows):
+    """Insert rows using multi-row VALUES statements instead of one per row."""
+    if not rows:
+        return
+    step = min(ROWS_PER_STMT, _MAX_SQL_PARAMS // len(rows[0]))
+    for i in range(0, len(rows), step):
+        chunk = rows[i:i + step]
+        conn.execute(
+            _multi_row_sql(sql, len(chunk)),
+            list(itertools.chain.from_iterable(chunk)),
+        )
+
+
 def _db_writer(conn, write_q, counters):
-    """Single writer thread: drains the queue and writes to SQLite."""
-    batch_sched = 0
-    batch_fare = 0
-
-    while True:
-        item = write_q.get()
-        if item is _SENTINEL:
-            conn.commit()
-            break
-
-        sched_rows, fare_rows = item
-
-        for row in sched_rows:
-            conn.execute(
-                """INSERT OR REPLACE INTO schedules
-                   (origin, destination, airline, year, month, day,
-                    flight_number, departure_time, arrival_time,
-                    carrier, scraped_at)
-                   VALUES (?,?,?,?,?,?,?,?,?,?,?)""",
-                row,
-            )
-        for row in fare_rows:
-            conn.execute(
-                """INSERT OR REPLACE INTO fares
-                   (origin, destination, airline, departure_date,
-                    arrival_date, price, currency, flight_number,
-                    scraped_at)
-                   VALUES (?,?,?,?,?,?,?,?,?)""",
-                row,
-            )
+    """Single writer thread: drains the queue and writes to SQLite.
+
+    Each drain blocks for one item, then greedily pulls whatever else is
+    already queued (up to ~BATCH_ROWS schedule rows) and writes the lot in
+    one BEGIN/COMMIT, so busy producers coalesce into large batches.
+    """
+    # WAL + synchronous=NORMAL keeps commits cheap without giving up
+    # crash safety; the larger page cache (64 MiB) absorbs index updates.
+    # The connection is shared, so these are restored on the way out.
+    conn.execute("PRAGMA journal_mode=WAL")
+    pragmas = {"synchronous": 1, "temp_store": 2, "cache_size": -65536}
+    prev_pragmas = {name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+                    for name in pragmas}
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    # Checkpointing is left to _wal_checkpointer so COMMITs only append
+    # to the WAL instead of occasionally copying it back into the DB.
+    prev_autocheckpoint = conn.execute("PRAGMA wal_autocheckpoint").fetchone()[0]
+    conn.execute("PRAGMA wal_autocheckpoint=0")
+
+    prev_isolation = conn.isolation_level
+    conn.isolation_level = None
+    in_txn = False
+    finished = False
+
+    try:
+        while not finished:
+            item = write_q.get()
+            if item is _SENTINEL:
+                break
+
+            # Workers hand over freshly built lists and never touch them
+            # again, so the first item's lists become the batch buffers.
+            sched_buf, fare_buf = item
+            while len(sched_buf) < BATCH_ROWS:
+                try:
+                    item = write_q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _SENTINEL:
+                    finished = True
+                    break
+                sched_buf.extend(item[0])
+                fare_buf.extend(item[1])
+
+            conn.execute("BEGIN IMMEDIATE")
+            in_txn = True
+            _insert_rows(conn, INSERT_SCHED_SQL, sched_buf)
+            _insert_rows(conn, INSERT_FARE_SQL, fare_buf)
+            conn.execute("COMMIT")
+            in_txn = False
+
+            counters["sched"] += len(sched_buf)
+            counters["fare"] += len(fare_buf)
+    except Exception:
+        if in_txn:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.isolation_level = prev_isolation
+        conn.execute(f"PRAGMA wal_autocheckpoint={prev_autocheckpoint}")
+        for name, value in prev_pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+
+
+def _wal_checkpointer(db_path, stop):
+    """Run passive WAL checkpoints on a separate connection until stopped."""
+    ckpt_conn = sqlite3.connect(db_path, timeout=60)
+    try:
+        while not stop.wait(CHECKPOINT_INTERVAL):
+            try:
+                ckpt_conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            except sqlite3.Error as exc:
+                log.debug("[%s] WAL checkpoint failed: %s", AIRLINE, exc)
+    finally:
+        ckpt_conn.close()
 
-        batch_sched += len(sched_rows)
-        batch_fare += len(fare_rows)
 
-        if batch_sched >= 500:
-            conn.commit()
-            counters["sched"] += batch_sched
-            counters["fare"] += batch_fare
-            batch_sched = 0
-            batch_fare = 0
+def _init_worker(worker_ids, shared_api_base, shared_cookies):
+    """Pool initializer: give each worker thread its own WizzairSession.
+
+    The session starts from the probe's cookie jar and CSRF token so its
+    first request does not need a fresh handshake.
+    """
+    sess = WizzairSession(
+        worker_id=next(worker_ids), shared_api_base=shared_api_base,
+    )
+    if shared_cookies:
+        sess._ensure_session()
+        sess._session.cookies.update(shared_cookies)
+        sess._sync_token()
+    _thread_state.session = sess
 
-    counters["sched"] += batch_sched
-    counters["fare"] += batch_fare
 
+def _worker(a, b, windows, scraped_at, write_q, counters_lock, counters):
+    """Fetch one route pair on the pool thread's session.
 
-def _worker(worker_id, my_pairs, windows, scraped_at, write_q,
-            counters_lock, counters, shared_api_base):
-    """Worker thread: HTTP only, pushes parsed results to write_q."""
-    sess = WizzairSession(worker_id=worker_id, shared_api_base=shared_api_base)
+    HTTP only, pushes parsed results to write_q.
+    """
+    sess = _thread_state.session
     local_errors = 0
 
-    for a, b in my_pairs:
+    try:
         for date_from, date_to in windows:
             payload = {
                 "flightList": [
@@ -174,26 +288,25 @@ def _worker(worker_id, my_pairs, windows, scraped_at, write_q,
             try:
                 data = sess.post("/search/timetable", payload)
             except Exception as exc:
-                log.debug("[W6-w%d] Error %s<->%s: %s", worker_id, a, b, exc)
+                log.debug("[W6-w%d] Error %s<->%s: %s", sess.worker_id, a, b, exc)
                 local_errors += 1
                 continue
 
             if not data:
                 continue
 
-            s1, f1 = _parse_flights(
+            all_sched, all_fare = _parse_flights(
                 data.get("outboundFlights"), a, b, scraped_at)
-            s2, f2 = _parse_flights(
-                data.get("returnFlights"), b, a, scraped_at)
+            _parse_flights(
+                data.get("returnFlights"), b, a, scraped_at,
+                all_sched, all_fare)
 
-            all_sched = s1 + s2
-            all_fare = f1 + f2
             if all_sched or all_fare:
                 write_q.put((all_sched, all_fare))
-
-    with counters_lock:
-        counters["errors"] += local_errors
-        counters["done"] += len(my_pairs)
+    finally:
+        with counters_lock:
+            counters["errors"] += local_errors
+            counters["done"] += 1
 
 
 def scrape_schedules(conn, limit=None, days_fresh=DEFAULT_FRESH_DAYS,
@@ -206,20 +319,12 @@ def scrape_schedules(conn, limit=None, days_fresh=DEFAULT_FRESH_DAYS,
         num_windows: number of 42-day windows to cover (4 = ~168 days)
         workers:    number of parallel sessions (default 4)
     """
-    if days_fresh > 0:
-        routes = _stale_routes(conn, days_fresh)
-    else:
-        routes = conn.execute(
-            "SELECT origin, destination FROM routes WHERE airline = ?",
-            (AIRLINE,),
-        ).fetchall()
+    pairs = _route_pairs(conn, days_fresh)
 
     total_routes = conn.execute(
         "SELECT COUNT(*) FROM routes WHERE airline = ?", (AIRLINE,)
     ).fetchone()[0]
 
-    pairs = _pair_routes(routes)
-
     if limit:
         pairs = pairs[:limit]
 
@@ -241,14 +346,16 @@ def scrape_schedules(conn, limit=None, days_fresh=DEFAULT_FRESH_DAYS,
     api_calls = len(pairs) * len(windows)
 
     log.info(
-        "[%s] Fetching timetables: %d pairs (%d routes, %d total) x %d windows "
+        "[%s] Fetching timetables: %d pairs (%d routes total) x %d windows "
         "= ~%d API calls, %d parallel workers",
-        AIRLINE, len(pairs), len(routes), total_routes, len(windows),
+        AIRLINE, len(pairs), total_routes, len(windows),
         api_calls, n_workers,
     )
 
     probe = WizzairSession(worker_id=99)
     shared_api_base = probe._base()
+    probe._ensure_session()
+    shared_cookies = probe._session.cookies.get_dict()
     log.info("[%s] API base: %s", AIRLINE, shared_api_base)
 
     write_q = queue.Queue(maxsize=200)
@@ -256,12 +363,22 @@ def scrape_schedules(conn, limit=None, days_fresh=DEFAULT_FRESH_DAYS,
     counters = {"sched": 0, "fare": 0, "errors": 0, "done": 0}
     t0 = time.time()
 
+    # Read before the writer thread starts using the shared connection.
+    db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+
     writer = threading.Thread(
         target=_db_writer, args=(conn, write_q, counters), daemon=True,
     )
     writer.start()
 
-    chunks = [pairs[i::n_workers] for i in range(n_workers)]
+    checkpoint_stop = threading.Event()
+    checkpointer = None
+    if db_path:
+        checkpointer = threading.Thread(
+            target=_wal_checkpointer, args=(db_path, checkpoint_stop),
+            daemon=True,
+        )
+        checkpointer.start()
 
     def _progress():
         while counters["done"] < len(pairs):
@@ -283,13 +400,17 @@ def scrape_schedules(conn, limit=None, days_fresh=DEFAULT_FRESH_DAYS,
     progress_thread = threading.Thread(target=_progress, daemon=True)
     progress_thread.start()
 
-    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+    with ThreadPoolExecutor(
+        max_workers=n_workers,
+        initializer=_init_worker,
+        initargs=(itertools.count(), shared_api_base, shared_cookies),
+    ) as pool:
         futures = [
             pool.submit(
-                _worker, i, chunks[i], windows, scraped_at,
-                write_q, counters_lock, counters, shared_api_base,
+                _worker, a, b, windows, scraped_at,
+                write_q, counters_lock, counters,
             )
-            for i in range(n_workers)
+            for a, b in pairs
         ]
         for f in as_completed(futures):
             try:
@@ -299,6 +420,9 @@ def scrape_schedules(conn, limit=None, days_fresh=DEFAULT_FRESH_DAYS,
 
     write_q.put(_SENTINEL)
     writer.join()
+    checkpoint_stop.set()
+    if checkpointer is not None:
+        checkpointer.join()
     conn.commit()
 
     elapsed = time.time() - t0
@@ -5,35 +5,127 @@ Edges  = directed routes between airports
 Colors = grouped by country
 """
 
+import base64
+import gzip
+import itertools
 import json
 import logging
 import math
+import os
+import re
 import sqlite3
+import struct
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
 
 import requests
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+from src.config import PROJECT_ROOT
+
 log = logging.getLogger("scraper")
 
+
+def _gzip_b64(data):
+    """Gzip JSON bytes and base64-encode them for a quoted JS string."""
+    return base64.b64encode(gzip.compress(data, 6, mtime=0))
+
+
+def _dumps(obj):
+    """Serialize obj to compact UTF-8 JSON bytes (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _serialize_payload(name, value):
+    data = _dumps(value)
+    return _gzip_b64(data) if name in _GZIP_PAYLOADS else data
+
+
 _EUR_RATE_URL = "https://open.er-api.com/v6/latest/EUR"
+# Rates are cached on disk for the current UTC day: {"date": ..., "rates": {...}}.
+# Like the payload cache below, this lives in the checkout, not DATA_DIR.
+_EUR_RATE_CACHE = PROJECT_ROOT / ".cache" / "eur_rates.json"
+_EUR_RATE_ATTEMPTS = 3
+_EUR_RATE_RETRY_DELAY = 0.3
+
+# One fare record: day offset from 2026-01-01 (int16), price in cents
+# (uint32), currency index (int16), airline index (uint8).
+_FARE_RECORD = struct.Struct("<hIhB")
+
+# Threads used to serialize and compress the template payloads.
+_SERIALIZE_WORKERS = 4
+
+# Rows pulled per fetchmany() call by the fare loader.
+_FETCH_ROWS = 8192
+
+# Serialized template payloads from the last build, keyed by DB state: a
+# JSON header line {"key": ..., "parts": [[name, length], ...]} followed by
+# the raw payload bytes.  Kept in the checkout rather than DATA_DIR, which
+# may be a folder received from someone else.
+_PAYLOAD_CACHE = PROJECT_ROOT / ".cache" / "graph_payloads.bin"
+
+
+def _load_cached_eur_rates(today):
+    try:
+        cached = json.loads(_EUR_RATE_CACHE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if cached.get("date") != today:
+        return None
+    return cached.get("rates")
+
+
+def _download_eur_rates():
+    """Fetch the full EUR rate table, retrying transient network errors."""
+    for attempt in range(1, _EUR_RATE_ATTEMPTS + 1):
+        try:
+            resp = requests.get(_EUR_RATE_URL, timeout=10)
+            resp.raise_for_status()
+            return resp.json().get("rates", {})
+        except requests.RequestException as exc:
+            if attempt == _EUR_RATE_ATTEMPTS:
+                raise
+            log.debug("EUR rate fetch failed (attempt %d): %s", attempt, exc)
+            time.sleep(_EUR_RATE_RETRY_DELAY)
 
 
 def _fetch_eur_rates(currencies):
-    """Return a list of rates (units-per-1-EUR) aligned with the currencies list."""
+    """Return (rates, fetched_ok) for the currencies list.
+
+    rates holds units-per-1-EUR aligned with currencies; fetched_ok is False
+    when the rate table could not be fetched and every rate fell back to 1.0.
+    """
     rates = [1.0] * len(currencies)
-    try:
-        resp = requests.get(_EUR_RATE_URL, timeout=10)
-        resp.raise_for_status()
-        api_rates = resp.json().get("rates", {})
-        for i, cur in enumerate(currencies):
-            if cur in api_rates:
-                rates[i] = round(api_rates[cur], 6)
-            else:
-                log.warning("No EUR rate for %s, prices will show as-is", cur)
+    today = datetime.now(timezone.utc).date().isoformat()
+    api_rates = _load_cached_eur_rates(today)
+    if api_rates is None:
+        try:
+            api_rates = _download_eur_rates()
+        except Exception as exc:
+            log.warning("Could not fetch exchange rates: %s -- prices will show as-is", exc)
+            return rates, False
+        try:
+            _EUR_RATE_CACHE.parent.mkdir(parents=True, exist_ok=True)
+            _EUR_RATE_CACHE.write_text(
+                json.dumps({"date": today, "rates": api_rates}), encoding="utf-8")
+        except OSError as exc:
+            log.debug("Could not cache exchange rates: %s", exc)
         log.info("Fetched EUR exchange rates for %d currencies", len(currencies))
-    except Exception as exc:
-        log.warning("Could not fetch exchange rates: %s -- prices will show as-is", exc)
-    return rates
+    for i, cur in enumerate(currencies):
+        if cur in api_rates:
+            rates[i] = round(api_rates[cur], 6)
+        else:
+            log.warning("No EUR rate for %s, prices will show as-is", cur)
+    return rates, True
 
 
 COUNTRY_PALETTE = [
@@ -64,6 +156,13 @@ _COUNTRY_NAMES = {
 
 
 def _load_graph_data(conn):
+    # SQLite hands back a fresh str per column per row, but only a few
+    # thousand distinct codes exist; share one object per value.
+    interned = {}
+
+    def intern(value):
+        return interned.setdefault(value, value)
+
     country_names = {}
     for row in conn.execute("SELECT code, name FROM countries"):
         if row[1]:
@@ -71,9 +170,13 @@ def _load_graph_data(conn):
 
     airports = {}
     for row in conn.execute(
-        "SELECT iata_code, name, city, country_code, latitude, longitude FROM airports"
+        """SELECT iata_code, name, city, country_code, latitude, longitude
+           FROM airports
+           WHERE iata_code IN (SELECT origin FROM routes
+                               UNION SELECT destination FROM routes)"""
     ):
         iata, name, city, cc, lat, lon = row
+        iata, cc = intern(iata), intern(cc)
         cname = country_names.get(cc) or _COUNTRY_NAMES.get(cc, cc.upper() if cc else "")
         airports[iata] = {
             "name": name, "city": city, "country": cc,
@@ -81,85 +184,89 @@ def _load_graph_data(conn):
             "country_name": cname,
         }
 
-    routes_raw = conn.execute("SELECT origin, destination, airline FROM routes").fetchall()
-    routes = [(r[0], r[1]) for r in routes_raw]
-
+    # One row per directed route; airlines are merged by SQLite.  The
+    # order of GROUP_CONCAT is undefined, so each list is sorted: its first
+    # airline picks the edge colour on the page.
     route_airlines = {}
-    for origin, dest, airline in routes_raw:
-        key = f"{origin}-{dest}"
-        if key not in route_airlines:
-            route_airlines[key] = []
-        if airline not in route_airlines[key]:
-            route_airlines[key].append(airline)
+    for origin, dest, airlines in conn.execute(
+        """SELECT origin, destination, GROUP_CONCAT(DISTINCT airline)
+           FROM routes
+           GROUP BY origin, destination"""
+    ):
+        origin, dest = intern(origin), intern(dest)
+        route_airlines[origin, dest] = [intern(a) for a in sorted(airlines.split(","))]
 
-    degree = {}
-    for origin, dest in routes:
-        degree[origin] = degree.get(origin, 0) + 1
+    degree = dict(conn.execute(
+        "SELECT origin, COUNT(*) FROM routes GROUP BY origin"
+    ))
 
+    # Departure days per route from fares and schedules; UNION dedupes
+    # and the ORDER BY leaves each route's days sorted and contiguous.
     avail = {}
-    for origin, dest, dep in conn.execute(
-        "SELECT origin, destination, departure_date FROM fares "
-        "WHERE departure_date IS NOT NULL"
-    ):
-        day = dep[:10] if dep else None
-        if not day:
-            continue
-        key = f"{origin}-{dest}"
-        if key not in avail:
-            avail[key] = []
-        if day not in avail[key]:
-            avail[key].append(day)
-    for origin, dest, y, m, d in conn.execute(
-        "SELECT origin, destination, year, month, day FROM schedules"
-    ):
-        if not (y and m and d):
-            continue
-        day = f"{y}-{m:02d}-{d:02d}"
-        key = f"{origin}-{dest}"
-        if key not in avail:
-            avail[key] = []
-        if day not in avail[key]:
-            avail[key].append(day)
-    for k in avail:
-        avail[k].sort()
-
-    from datetime import date as _date
-    base_date = _date(2026, 1, 1)
-    currencies = []
+    days = conn.execute(
+        """SELECT origin, destination, substr(departure_date, 1, 10)
+           FROM fares
+           WHERE departure_date IS NOT NULL AND departure_date != ''
+           UNION
+           SELECT origin, destination, printf('%04d-%02d-%02d', year, month, day)
+           FROM schedules
+           WHERE year AND month AND day
+           ORDER BY 1, 2, 3"""
+    )
+    for (origin, dest), grp in itertools.groupby(days, key=lambda r: (r[0], r[1])):
+        avail[f"{origin}-{dest}"] = [r[2] for r in grp]
+
+    # Cheapest fare per route and day, packed as fixed-size little-endian
+    # records (see _FARE_RECORD) and shipped base64-encoded; the page
+    # decodes them with a DataView.  Records of one route are contiguous,
+    # in the order given by "_k"/"_n".
+    # The day offset from 2026-01-01 is computed by SQLite (NULL for a
+    # malformed date).
     cur_idx = {}
-    fares = {}
-    for origin, dest, dep, price, currency, airline in conn.execute(
-        """SELECT origin, destination, substr(departure_date, 1, 10),
+    airline_idx = {}
+    route_keys = []
+    route_counts = []
+    packed = bytearray()
+    pack = _FARE_RECORD.pack
+    prev_key = None
+    cur = conn.execute(
+        """SELECT origin, destination,
+                  CAST(julianday(substr(departure_date, 1, 10))
+                       - julianday('2026-01-01') AS INTEGER),
                   MIN(price), currency, airline
            FROM fares
            WHERE departure_date >= date('now') AND price > 0
            GROUP BY origin, destination, substr(departure_date, 1, 10)
            ORDER BY origin, destination, departure_date"""
+    )
+    for origin, dest, offset, price, currency, airline in itertools.chain.from_iterable(
+        iter(lambda: cur.fetchmany(_FETCH_ROWS), [])
     ):
-        if not dep or price is None:
+        if offset is None or price is None:
             continue
-        if currency not in cur_idx:
-            cur_idx[currency] = len(currencies)
-            currencies.append(currency)
-        key = f"{origin}-{dest}"
-        if key not in fares:
-            fares[key] = []
-        try:
-            d = _date.fromisoformat(dep)
-            offset = (d - base_date).days
-        except ValueError:
-            continue
-        p = round(price, 2)
-        if p == int(p):
-            p = int(p)
-        fares[key].append([offset, p, cur_idx[currency], airline])
-
-    eur_rates = _fetch_eur_rates(currencies)
-
-    fare_data = {"_c": currencies, "_r": eur_rates}
-    fare_data.update(fares)
+        origin, dest = intern(origin), intern(dest)
+        key = (origin, dest)
+        if key != prev_key:
+            route_keys.append(f"{origin}-{dest}")
+            route_counts.append(0)
+            prev_key = key
+        route_counts[-1] += 1
+        packed += pack(offset, round(price * 100),
+                       cur_idx.setdefault(currency, len(cur_idx)),
+                       airline_idx.setdefault(airline, len(airline_idx)))
+
+    # Both index dicts keep insertion order, which matches their indices.
+    currencies = list(cur_idx)
+    airlines = list(airline_idx)
+    eur_rates, rates_fetched = _fetch_eur_rates(currencies)
+
+    fare_data = {
+        "_c": currencies, "_r": eur_rates, "_a": airlines,
+        "_k": route_keys, "_n": route_counts,
+        "_bin": base64.b64encode(packed).decode("ascii"),
+    }
 
-    return airports, routes, degree, avail, route_airlines, fare_data
+    return airports, degree, avail, route_airlines, fare_data, rates_fetched
 
 
 def _assign_colors(airports):
@@ -170,37 +277,98 @@ def _assign_colors(airports):
     return color_map
 
 
-def build_network_html(conn, output_path):
-    """Build a standalone interactive HTML file with the route network."""
-    airports, routes, degree, avail, route_airlines, fare_data = _load_graph_data(conn)
-    color_map = _assign_colors(airports)
+def _payload_cache_key(conn):
+    """Identify the graph payloads by DB file state, day and code version.
 
-    nodes_with_routes = set()
-    for origin, dest in routes:
-        nodes_with_routes.add(origin)
-        nodes_with_routes.add(dest)
+    A non-empty WAL file is included because committed writes may not have
+    been checkpointed into the main file yet (an empty one is recreated on
+    every open, so its mtime means nothing).  Returns None for in-memory DBs.
+    """
+    db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+    if not db_path:
+        return None
+    key = [db_path, datetime.now(timezone.utc).date().isoformat(),
+           Path(__file__).stat().st_mtime_ns]
+    for suffix in ("", "-wal"):
+        try:
+            st = os.stat(db_path + suffix)
+        except OSError:
+            continue
+        if st.st_size:
+            key += [suffix, st.st_mtime_ns, st.st_size]
+    return repr(key)
+
+
+def _load_cached_payloads(key):
+    if key is None:
+        return None
+    try:
+        with _PAYLOAD_CACHE.open("rb") as fh:
+            header = json.loads(fh.readline())
+            if header["key"] != key:
+                return None
+            payloads = {}
+            for name, length in header["parts"]:
+                data = fh.read(length)
+                if len(data) != length:
+                    return None
+                payloads[name] = data
+            if fh.read(1) or set(payloads) != set(_PLACEHOLDERS):
+                return None
+    except Exception as exc:  # any unreadable or malformed cache is a miss
+        log.debug("Ignoring graph payload cache: %s", exc)
+        return None
+    return payloads
+
+
+def _store_cached_payloads(key, payloads):
+    if key is None:
+        return
+    header = {"key": key, "parts": [[name, len(data)] for name, data in payloads.items()]}
+    try:
+        _PAYLOAD_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        with _PAYLOAD_CACHE.open("wb") as fh:
+            fh.write(json.dumps(header).encode("utf-8") + b"\n")
+            for data in payloads.values():
+                fh.write(data)
+    except OSError as exc:
+        log.debug("Could not cache graph payloads: %s", exc)
+
+
+def _build_payloads(conn):
+    """Load the graph from the DB and serialize every template payload.
+
+    The connection is only read from; it is switched to query_only while
+    the graph data is loaded.  Returns the payloads and whether they are
+    fit to cache (False when the EUR rates fell back to 1.0).
+    """
+    # Keep the tables' indexes resident for the grouped scans below
+    # (256 MiB page cache, 256 MiB mmap, in-memory sort/temp b-trees).
+    # Every setting changed here is restored before returning.
+    pragmas = {"cache_size": -262144, "temp_store": 2, "mmap_size": 268435456,
+               "query_only": 1}
+    prev_pragmas = {name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+                    for name in pragmas}
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    # The loaders unpack plain tuples, which are also the cheapest rows.
+    prev_row_factory = conn.row_factory
+    conn.row_factory = None
+    try:
+        (airports, degree, avail, route_airlines, fare_data,
+         rates_fetched) = _load_graph_data(conn)
+    finally:
+        conn.row_factory = prev_row_factory
+        for name, value in prev_pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+    color_map = _assign_colors(airports)
 
     nodes_js = []
     for iata, info in airports.items():
-        if iata not in nodes_with_routes:
-            continue
-        deg = degree.get(iata, 0)
-        size = 4 + math.sqrt(deg) * 3
-        color = color_map.get(info["country"], "#888888")
-        label = iata
-        title = (
-            f"<b>{info['name']}</b> ({iata})<br>"
-            f"City: {info['city']}<br>"
-            f"Country: {info['country'].upper()}<br>"
-            f"Routes: {deg}<br>"
-            f"Lat: {info['lat']}, Lon: {info['lon']}"
-        )
-        x = (info["lon"] or 0) * 12
-        y = -(info["lat"] or 0) * 12
+        size = 4 + math.sqrt(degree.get(iata, 0)) * 3
         nodes_js.append({
-            "id": iata, "label": label, "title": title,
-            "size": round(size, 1), "color": color,
-            "x": round(x, 1), "y": round(y, 1),
+            "id": iata,
+            "size": round(size, 1),
             "country": info["country"],
             "lat": info["lat"] or 0,
             "lon": info["lon"] or 0,
@@ -209,48 +377,80 @@ def build_network_html(conn, output_path):
             "country_name": info["country_name"],
         })
 
-    edges_js = []
-    seen_edges = set()
-    for origin, dest in routes:
-        edge_key = f"{origin}-{dest}"
-        if origin in airports and dest in airports and edge_key not in seen_edges:
-            airlines = route_airlines.get(edge_key, [])
-            edges_js.append({"from": origin, "to": dest, "airlines": airlines})
-            seen_edges.add(edge_key)
+    # route_airlines already holds exactly one entry per directed route.
+    edges_js = [
+        {"from": origin, "to": dest, "airlines": airlines}
+        for (origin, dest), airlines in route_airlines.items()
+        if origin in airports and dest in airports
+    ]
 
     country_legend = {}
-    for iata, info in airports.items():
+    for info in airports.values():
         cc = info["country"]
-        if cc and cc not in country_legend:
-            country_legend[cc] = color_map.get(cc, "#888")
+        if cc:
+            country_legend.setdefault(cc, color_map.get(cc, "#888"))
 
     airline_meta = {}
-    all_codes = set()
+    route_counts = Counter()
     for e in edges_js:
-        for al in e.get("airlines", []):
-            all_codes.add(al)
+        route_counts.update(e["airlines"])
     _airline_info = {
         "FR": {"name": "Ryanair", "color": "#003399"},
         "W6": {"name": "Wizz Air", "color": "#c6007e"},
     }
-    for code in sorted(all_codes):
+    for code in sorted(route_counts):
         info = _airline_info.get(code, {"name": code, "color": "#888888"})
-        cnt = sum(1 for e in edges_js if code in e.get("airlines", []))
-        airline_meta[code] = {"name": info["name"], "color": info["color"], "routes": cnt}
-
-    html = _TEMPLATE.replace("__NODES__", json.dumps(nodes_js))
-    html = html.replace("__EDGES__", json.dumps(edges_js))
-    html = html.replace("__LEGEND__", json.dumps(country_legend))
-    html = html.replace("__NODE_COUNT__", str(len(nodes_js)))
-    html = html.replace("__EDGE_COUNT__", str(len(edges_js)))
-    html = html.replace("__AVAIL__", json.dumps(avail, separators=(",", ":")))
-    html = html.replace("__AIRLINE_META__", json.dumps(airline_meta))
-    html = html.replace("__FARE_DATA__", json.dumps(fare_data, separators=(",", ":")))
+        airline_meta[code] = {
+            "name": info["name"], "color": info["color"],
+            "routes": route_counts[code],
+        }
 
+    values = {
+        "__NODES__": nodes_js,
+        "__EDGES__": edges_js,
+        "__LEGEND__": country_legend,
+        "__NODE_COUNT__": len(nodes_js),
+        "__EDGE_COUNT__": len(edges_js),
+        "__AVAIL__": avail,
+        "__AIRLINE_META__": airline_meta,
+        "__FARE_DATA__": fare_data,
+    }
+
+    # The payloads are independent; zlib drops the GIL while compressing,
+    # so the big ones overlap across threads.
+    with ThreadPoolExecutor(max_workers=_SERIALIZE_WORKERS) as pool:
+        futures = {
+            name: pool.submit(_serialize_payload, name, value)
+            for name, value in values.items()
+        }
+        return {name: f.result() for name, f in futures.items()}, rates_fetched
+
+
+def build_network_html(conn, output_path):
+    """Build a standalone interactive HTML file with the route network.
+
+    Serialized payloads are reused from the previous build while the DB
+    is unchanged (see _payload_cache_key).
+    """
+    key = _payload_cache_key(conn)
+    payloads = _load_cached_payloads(key)
+    if payloads is None:
+        payloads, cacheable = _build_payloads(conn)
+        # Fallback EUR rates are not cached, so the next build retries them.
+        if cacheable:
+            _store_cached_payloads(key, payloads)
+    else:
+        log.info("Database unchanged, reusing cached graph data")
+
+    # Stream template slices and payloads instead of building the whole
+    # page in memory with repeated str.replace passes.
     output_path = Path(output_path)
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(html, encoding="utf-8")
-    log.info("Graph written to %s (%d nodes, %d edges)", output_path, len(nodes_js), len(edges_js))
+    with output_path.open("wb", buffering=1 << 20) as fh:
+        for i, part in enumerate(_TEMPLATE_PARTS):
+            fh.write(payloads[part] if i % 2 else part)
+    log.info("Graph written to %s (%d nodes, %d edges)", output_path,
+             int(payloads["__NODE_COUNT__"]), int(payloads["__EDGE_COUNT__"]))
     return output_path
 
 
@@ -348,6 +548,7 @@ _TEMPLATE = r"""<!DOCTYPE html>
   #tree-wrap::-webkit-scrollbar-track { background: transparent; }
   #tree-wrap::-webkit-scrollbar-thumb { background: #30363d; border-radius: 2px; }
 
+  #tree { display: flex; flex-direction: column; }
   .cg { margin-bottom: 1px; }
   .cg-hd {
     display: flex; align-items: center; gap: 4px; padding: 3px 2px;
@@ -389,14 +590,14 @@ _TEMPLATE = r"""<!DOCTYPE html>
   .ct-row.hl .ct-name { color: #e3b341; }
   @keyframes flash-row { 0%,100% { background: transparent; } 40% { background: rgba(88,166,255,0.25); } }
   .ct-row.flash { animation: flash-row 0.6s ease 2; }
-  .node-label {
-    display: none; position: absolute; left: calc(100% + 4px); top: 50%;
-    transform: translateY(-50%); white-space: nowrap;
+  #node-label {
+    display: none; position: fixed; z-index: 999;
+    transform: translate(6px, -50%); white-space: nowrap;
     font: 600 10px/1 -apple-system, BlinkMacSystemFont, sans-serif;
     color: #fff; background: rgba(13,17,23,0.85); padding: 2px 5px;
     border-radius: 3px; pointer-events: none;
   }
-  .node-label.show { display: block; }
+  #node-label.show { display: block; }
 
   #filter-box {
     background: rgba(22,27,34,0.94); border: 1px solid #30363d;
@@ -655,6 +856,7 @@ _TEMPLATE = r"""<!DOCTYPE html>
 </head>
 <body>
 <div id="globeViz"></div>
+<div id="node-label"></div>
 
 <div id="left-col">
 <div id="left-col-resize"></div>
@@ -746,83 +948,389 @@ _TEMPLATE = r"""<!DOCTYPE html>
 </div>
 
 <script>
-var nodesData = __NODES__;
-var edgesData = __EDGES__;
-var availData = __AVAIL__;
+/* Bulky payloads are embedded as base64 gzip; they are inflated before
+   the app script below is started. */
+var _payloads = {
+  nodes: "__NODES__", edges: "__EDGES__",
+  avail: "__AVAIL__", fares: "__FARE_DATA__"
+};
+</script>
+<script type="text/x-deferred" id="app-src">
+var nodesData = _payloads.nodes;
+var edgesData = _payloads.edges;
+var availData = _payloads.avail;
 var airlineMeta = __AIRLINE_META__;
-var _rawFares = __FARE_DATA__;
+var countryLegend = __LEGEND__;
+nodesData.forEach(function(n) { n.color = countryLegend[n.country] || "#888888"; });
+var _rawFares = _payloads.fares;
+_payloads = null;
 
 var fareCurrencies = _rawFares._c || [];
 var fareEurRates = _rawFares._r || [];
 var fareByRoute = {};
 (function() {
   var BASE = Date.UTC(2026, 0, 1);
-  Object.keys(_rawFares).forEach(function(rk) {
-    if (rk === "_c" || rk === "_r") return;
-    fareByRoute[rk] = _rawFares[rk].map(function(e) {
-      var d = new Date(BASE + e[0] * 86400000);
-      var ds = d.toISOString().slice(0, 10);
-      var cur = fareCurrencies[e[2]];
-      var rate = fareEurRates[e[2]] || 1;
-      var eur = e[1] / rate;
-      return {date: ds, price: e[1], currency: cur, airline: e[3], eur: Math.round(eur * 100) / 100};
-    });
-  });
+  var REC = 9;  /* <hIhB: day offset, price cents, currency, airline */
+  var bin = atob(_rawFares._bin || "");
+  var bytes = new Uint8Array(bin.length);
+  for (var i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+  var view = new DataView(bytes.buffer);
+  var airlines = _rawFares._a || [];
+  var keys = _rawFares._k || [], counts = _rawFares._n || [];
+  var dayStr = {};
+  var pos = 0;
+  for (var k = 0; k < keys.length; k++) {
+    var list = new Array(counts[k]);
+    for (var j = 0; j < counts[k]; j++, pos += REC) {
+      var day = view.getInt16(pos, true);
+      var ds = dayStr[day] || (dayStr[day] =
+        new Date(BASE + day * 86400000).toISOString().slice(0, 10));
+      var price = view.getUint32(pos + 2, true) / 100;
+      var ci = view.getInt16(pos + 6, true);
+      var rate = fareEurRates[ci] || 1;
+      list[j] = {date: ds, price: price, currency: fareCurrencies[ci],
+                 airline: airlines[view.getUint8(pos + 8)],
+                 eur: Math.round(price / rate * 100) / 100};
+    }
+    fareByRoute[keys[k]] = list;
+  }
   _rawFares = null;
 })();
 var intersectMode = false;
 var tfEnabled = false;
 var tfActiveEdges = null;
 
+/* Integer ids for airports and routes; a route pair is keyed (from<<16)|to. */
 var nodeMap = {};
-nodesData.forEach(function(n) { nodeMap[n.id] = n; });
+var nodeIdx = {};
+var nodesArr = [];
+var nodeIds = [];
+function nodeIndex(id) {
+  var i = nodeIdx[id];
+  if (i === undefined) {
+    i = nodeIdx[id] = nodesArr.length;
+    nodesArr.push(nodeMap[id] || null);
+    nodeIds.push(id);
+  }
+  return i;
+}
+nodesData.forEach(function(n) { nodeMap[n.id] = n; n._i = nodeIndex(n.id); });
+
+/* Display name per airport id, plus lowercased name and id for filtering. */
+var cityNameMap = Object.create(null);
+var cityNameLC = Object.create(null);
+var cityIdLC = Object.create(null);
+nodesData.forEach(function(n) {
+  cityNameMap[n.id] = n.city || n.name || n.id;
+  cityNameLC[n.id] = cityNameMap[n.id].toLowerCase();
+  cityIdLC[n.id] = n.id.toLowerCase();
+});
+var nameCollator = new Intl.Collator();
+
+/* Substring index over airport ids, names and cities: each substring of up
+   to SUB_GRAM characters maps to the ascending nodesData indices that
+   contain it. Longer queries look up their first SUB_GRAM characters and
+   check only those candidates, so matching is still a plain substring test. */
+var SUB_GRAM = 3;
+var nodeSubIndex = new Map();
+nodesData.forEach(function(n, i) {
+  [n.id, n.name, n.city].forEach(function(str) {
+    if (!str) return;
+    str = str.toLowerCase();
+    for (var a = 0; a < str.length; a++) {
+      for (var b = a + 1; b <= a + SUB_GRAM && b <= str.length; b++) {
+        var gram = str.slice(a, b);
+        var list = nodeSubIndex.get(gram);
+        if (!list) nodeSubIndex.set(gram, list = []);
+        if (list[list.length - 1] !== i) list.push(i);
+      }
+    }
+  });
+});
+function subCandidates(q) {
+  return nodeSubIndex.get(q.slice(0, SUB_GRAM)) || [];
+}
 
-var activeCities = new Set();
-var activeAirlines = new Set(Object.keys(airlineMeta));
+function pairKey(from, to) {
+  var f = nodeIdx[from], t = nodeIdx[to];
+  return f === undefined || t === undefined ? null : (f << 16) | t;
+}
 
-var nodeAirlines = {};
-var edgeAirlines = {};
+/* Dates are compared as packed yyyymmdd integers; ISO strings are only
+   rebuilt for display and booking links. */
+function isoToInt(s) {
+  return +s.slice(0, 4) * 10000 + +s.slice(5, 7) * 100 + +s.slice(8, 10);
+}
+function intToIso(n) {
+  var m = (n / 100 | 0) % 100, d = n % 100;
+  return (n / 10000 | 0) + "-" + (m < 10 ? "0" : "") + m + "-" + (d < 10 ? "0" : "") + d;
+}
+function fareDay(f) {
+  return f._dnum || (f._dnum = isoToInt(f.date));
+}
+
+/* availData / fareByRoute re-keyed by route pair, built once. Availability
+   days are sorted Int32Arrays of packed dates; NO_DAYS stands in for routes
+   without any. */
+var NO_DAYS = new Int32Array(0);
+var availKeys = Object.keys(availData);
+var availPairs = new Int32Array(availKeys.length);
+var availByPair = new Map();
+var availFirst = null, availLast = null;
+availKeys.forEach(function(key, i) {
+  var parts = key.split("-");
+  var pk = (nodeIndex(parts[0]) << 16) | nodeIndex(parts[1]);
+  var days = Int32Array.from(availData[key], isoToInt).sort();
+  availPairs[i] = pk;
+  availByPair.set(pk, days);
+  if (!days.length) return;
+  if (availFirst === null || days[0] < availFirst) availFirst = days[0];
+  if (availLast === null || days[days.length - 1] > availLast) availLast = days[days.length - 1];
+});
+if (availFirst !== null) {
+  availFirst = intToIso(availFirst);
+  availLast = intToIso(availLast);
+}
+
+/* First index in the sorted date array `arr` with arr[i] >= t. */
+function lbDate(arr, t) {
+  var lo = 0, hi = arr.length;
+  while (lo < hi) {
+    var m = (lo + hi) >>> 1;
+    if (arr[m] < t) lo = m + 1;
+    else hi = m;
+  }
+  return lo;
+}
+var fareByPair = new Map();
+Object.keys(fareByRoute).forEach(function(key) {
+  var parts = key.split("-");
+  fareByPair.set((nodeIndex(parts[0]) << 16) | nodeIndex(parts[1]), fareByRoute[key]);
+});
+
+/* Selected airports as a bitmap over node indices (airports from
+   nodesData come first, so their indices stay in range). The object keeps
+   the Set-style calls used by the UI; hot loops read activeCityBits. */
+var activeCityBits = new Uint8Array(nodesData.length);
+
+/* Per-country counts of visible, selected, and selected-and-visible
+   airports for the tree headers. Kept current by activeCities and by the
+   node visibility refcounts, so syncUI never rescans a country. */
+var nodeCC = nodesData.map(function(n) { return (n.country || "").toLowerCase(); });
+var ccVisible = {}, ccSelected = {}, ccSelVisible = {};
+function countSelected(i, d) {
+  var cc = nodeCC[i];
+  if (!cc) return;
+  ccSelected[cc] = (ccSelected[cc] || 0) + d;
+  if (visibleNodeRefcount[i] > 0) ccSelVisible[cc] = (ccSelVisible[cc] || 0) + d;
+}
+
+var activeCities = {
+  size: 0,
+  version: 0,
+  has: function(id) { return activeCityBits[nodeIdx[id]] === 1; },
+  add: function(id) {
+    var i = nodeIdx[id];
+    if (i === undefined || activeCityBits[i]) return;
+    activeCityBits[i] = 1;
+    this.size++;
+    this.version++;
+    countSelected(i, 1);
+  },
+  delete: function(id) {
+    var i = nodeIdx[id];
+    if (i === undefined || !activeCityBits[i]) return;
+    activeCityBits[i] = 0;
+    this.size--;
+    this.version++;
+    countSelected(i, -1);
+  },
+  clear: function() {
+    activeCityBits.fill(0);
+    this.size = 0;
+    this.version++;
+    ccSelected = {};
+    ccSelVisible = {};
+  },
+  indices: function() {
+    var out = [];
+    for (var i = 0; i < activeCityBits.length; i++) { if (activeCityBits[i]) out.push(i); }
+    return out;
+  }
+};
+
+/* Airlines by small integer index; edge airlines as CSR over those (in
+   the order listed) plus, for up to 32 airlines, a presence bitmask. */
+var airlineCodes = Object.keys(airlineMeta);
+var airlineIdx = {};
+airlineCodes.forEach(function(code, i) { airlineIdx[code] = i; });
 edgesData.forEach(function(e) {
   (e.airlines || []).forEach(function(al) {
-    if (!nodeAirlines[e.from]) nodeAirlines[e.from] = new Set();
-    if (!nodeAirlines[e.to]) nodeAirlines[e.to] = new Set();
-    nodeAirlines[e.from].add(al);
-    nodeAirlines[e.to].add(al);
+    if (airlineIdx[al] === undefined) { airlineIdx[al] = airlineCodes.length; airlineCodes.push(al); }
   });
-  edgeAirlines[e.from + "-" + e.to] = e.airlines || [];
-  edgeAirlines[e.to + "-" + e.from] = e.airlines || [];
 });
+/* Display name and arc colour per airline index; one shared string per
+   airline for every arc and popup. */
+var airlineColorStr = airlineCodes.map(function(code) {
+  return (airlineMeta[code] && airlineMeta[code].color) || "#888888";
+});
+var airlineNameStr = airlineCodes.map(function(code) {
+  return (airlineMeta[code] && airlineMeta[code].name) || code;
+});
+/* The bitmasks only exist while every airline fits in 32 bits; with more,
+   hasActiveAirline() scans the CSR lists against activeAirlineBits. */
+var airlineMasked = airlineCodes.length <= 32;
+var activeAirlineBits = new Uint8Array(airlineCodes.length);
+var activeMask = new Uint32Array(1);
+Object.keys(airlineMeta).forEach(function(code) {
+  activeAirlineBits[airlineIdx[code]] = 1;
+  if (airlineMasked) activeMask[0] |= 1 << airlineIdx[code];
+});
+var edgeMask = new Uint32Array(airlineMasked ? edgesData.length : 0);
+var edgeAlOff = new Int32Array(edgesData.length + 1);
+var edgeAlIdx = [];
+edgesData.forEach(function(e, i) {
+  edgeAlOff[i] = edgeAlIdx.length;
+  (e.airlines || []).forEach(function(al) {
+    edgeAlIdx.push(airlineIdx[al]);
+    if (airlineMasked) edgeMask[i] |= 1 << airlineIdx[al];
+  });
+});
+edgeAlOff[edgesData.length] = edgeAlIdx.length;
+edgeAlIdx = Uint16Array.from(edgeAlIdx);
+
+function hasActiveAirline(i) {
+  if (airlineMasked) return (edgeMask[i] & activeMask[0]) !== 0;
+  for (var p = edgeAlOff[i], q = edgeAlOff[i + 1]; p < q; p++) {
+    if (activeAirlineBits[edgeAlIdx[p]]) return true;
+  }
+  return false;
+}
+
+var edgeFrom = new Int32Array(edgesData.length);
+var edgeTo = new Int32Array(edgesData.length);
+var pairId = new Map();
+edgesData.forEach(function(e, i) {
+  var a = nodeIndex(e.from), b = nodeIndex(e.to);
+  e._i = i;
+  edgeFrom[i] = a;
+  edgeTo[i] = b;
+  pairId.set((a << 16) | b, i);
+  pairId.set((b << 16) | a, i);
+});
+
+var edgesByNode = [];
+for (var ei = 0; ei < edgesData.length; ei++) {
+  var ea = edgeFrom[ei], eb = edgeTo[ei];
+  (edgesByNode[ea] || (edgesByNode[ea] = [])).push(ei);
+  if (eb !== ea) (edgesByNode[eb] || (edgesByNode[eb] = [])).push(ei);
+}
+
+/* Edge visibility under the airline filter, kept up to date per toggled
+   airline. A node is visible while any incident edge is. */
+var airlineToEdges = {};
+edgesData.forEach(function(e, i) {
+  (e.airlines || []).forEach(function(al) {
+    (airlineToEdges[al] || (airlineToEdges[al] = [])).push(i);
+  });
+});
+Object.keys(airlineToEdges).forEach(function(al) {
+  airlineToEdges[al] = Int32Array.from(airlineToEdges[al]);
+});
+var visibleEdgeIdx = new Uint8Array(edgesData.length);
+var visibleNodeRefcount = new Int32Array(nodesArr.length);
+var visibleEdgeCount = 0, visibleNodeCount = 0;
+
+function bumpNodeRef(n, d) {
+  var before = visibleNodeRefcount[n];
+  visibleNodeRefcount[n] += d;
+  if (!nodesArr[n] || (before === 0) === (visibleNodeRefcount[n] === 0)) return;
+  visibleNodeCount += d;
+  var cc = nodeCC[n];
+  if (!cc) return;
+  ccVisible[cc] = (ccVisible[cc] || 0) + d;
+  if (activeCityBits[n]) ccSelVisible[cc] = (ccSelVisible[cc] || 0) + d;
+}
+
+function setEdgeVisible(i, vis) {
+  if (visibleEdgeIdx[i] === vis) return;
+  visibleEdgeIdx[i] = vis;
+  var d = vis ? 1 : -1;
+  visibleEdgeCount += d;
+  bumpNodeRef(edgeFrom[i], d);
+  bumpNodeRef(edgeTo[i], d);
+}
+
+function setAirlineActive(code, on) {
+  activeAirlineBits[airlineIdx[code]] = on ? 1 : 0;
+  if (airlineMasked) {
+    var bit = 1 << airlineIdx[code];
+    if (on) activeMask[0] |= bit;
+    else activeMask[0] &= ~bit;
+  }
+  airlineVersion++;
+  var edges = airlineToEdges[code] || [];
+  for (var k = 0; k < edges.length; k++) {
+    setEdgeVisible(edges[k], hasActiveAirline(edges[k]) ? 1 : 0);
+  }
+}
+
+for (var vi = 0; vi < edgesData.length; vi++) {
+  if (hasActiveAirline(vi)) setEdgeVisible(vi, 1);
+}
+
+/* Per-edge airline info, memoized until the airline filter changes. */
+var airlineVersion = 0;
+var edgeCache = new Array(edgesData.length);
+var edgeCacheVer = -1;
+
+function getEdgeInfo(e) {
+  if (edgeCacheVer !== airlineVersion) {
+    edgeCache = new Array(edgesData.length);
+    edgeCacheVer = airlineVersion;
+  }
+  var info = edgeCache[e._i];
+  if (info) return info;
+  var als = e.airlines || [];
+  var visible = [];
+  var firstIdx = -1;
+  if (hasActiveAirline(e._i)) {
+    for (var p = edgeAlOff[e._i], q = edgeAlOff[e._i + 1]; p < q; p++) {
+      if (!activeAirlineBits[edgeAlIdx[p]]) continue;
+      if (firstIdx < 0) firstIdx = edgeAlIdx[p];
+      visible.push(airlineCodes[edgeAlIdx[p]]);
+    }
+  }
+  info = {
+    visible: visible,
+    firstCode: firstIdx >= 0 ? airlineCodes[firstIdx] : als[0] || "FR",
+    color: firstIdx >= 0 ? airlineColorStr[firstIdx] : "#888888"
+  };
+  edgeCache[e._i] = info;
+  return info;
+}
 
 function edgeAirlineColor(from, to) {
-  var als = edgeAirlines[from + "-" + to] || [];
-  for (var i = 0; i < als.length; i++) { if (activeAirlines.has(als[i])) return airlineArcColor(als[i]); }
-  return "#888888";
+  var id = pairId.get(pairKey(from, to));
+  return id === undefined ? "#888888" : getEdgeInfo(edgesData[id]).color;
 }
 
 function edgeAirlineCode(from, to) {
-  var als = edgeAirlines[from + "-" + to] || [];
-  for (var i = 0; i < als.length; i++) { if (activeAirlines.has(als[i])) return als[i]; }
-  return als[0] || "FR";
+  var id = pairId.get(pairKey(from, to));
+  return id === undefined ? "FR" : getEdgeInfo(edgesData[id]).firstCode;
 }
 
 function isNodeVisible(id) {
-  var als = nodeAirlines[id];
-  if (!als) return false;
-  var it = als.values(), v;
-  while (!(v = it.next()).done) { if (activeAirlines.has(v.value)) return true; }
-  return false;
+  var i = nodeIdx[id];
+  return i !== undefined && visibleNodeRefcount[i] > 0;
 }
 
 function isEdgeVisible(e) {
-  var als = e.airlines || [];
-  for (var i = 0; i < als.length; i++) { if (activeAirlines.has(als[i])) return true; }
-  return false;
+  return visibleEdgeIdx[e._i] === 1;
 }
 
 function edgeAirline(e) {
-  var als = e.airlines || [];
-  for (var i = 0; i < als.length; i++) { if (activeAirlines.has(als[i])) return als[i]; }
-  return als[0] || "FR";
+  return getEdgeInfo(e).firstCode;
 }
 
 var outDeg = {}, inDeg = {};
@@ -853,8 +1361,7 @@ function hexToRgba(hex, a) {
   return "rgba(" + r + "," + g + "," + b + "," + a + ")";
 }
 
-/* ---- Globe: flat HTML circle nodes ---- */
-var nodeEls = {};
+/* ---- Globe: airports as a points layer ---- */
 var cityRows = {};
 var DEG2RAD = Math.PI / 180;
 function calcBearing(lat1, lng1, lat2, lng2) {
@@ -876,13 +1383,14 @@ function destPoint(lat, lng, bearing, distKm) {
   return {lat: la2 / DEG2RAD, lng: lo2 / DEG2RAD};
 }
 
+var ARROW_WING_KM = 22;
+var ARROW_SPREAD = 24;
+
 function addArrowArcs(arcs, fromLat, fromLng, toLat, toLng, color, alt, fromIata, toIata, airline) {
   var brng = calcBearing(fromLat, fromLng, toLat, toLng);
   var rev = brng + 180;
-  var wingLen = 22;
-  var spread = 24;
-  var lp = destPoint(toLat, toLng, rev + spread, wingLen);
-  var rp = destPoint(toLat, toLng, rev - spread, wingLen);
+  var lp = destPoint(toLat, toLng, rev + ARROW_SPREAD, ARROW_WING_KM);
+  var rp = destPoint(toLat, toLng, rev - ARROW_SPREAD, ARROW_WING_KM);
   arcs.push({
     startLat: lp.lat, startLng: lp.lng,
     endLat: toLat, endLng: toLng,
@@ -897,46 +1405,66 @@ function addArrowArcs(arcs, fromLat, fromLng, toLat, toLng, color, alt, fromIata
   });
 }
 
-function createNodeEl(d) {
-  var sz = Math.max(4, 2.5 + d.size * 0.12);
-  var el = document.createElement("div");
-  el.style.cssText = "width:" + sz + "px;height:" + sz + "px;border-radius:50%;" +
-    "background:" + d.color + ";pointer-events:auto;cursor:pointer;" +
-    "border:0.5px solid rgba(255,255,255,0.25);transition:box-shadow 0.2s;" +
-    "position:relative;";
-  el.title = d.name + " (" + d.id + ") - " + d.city + ", " +
-    (d.country_name || d.country.toUpperCase());
-  var lbl = document.createElement("span");
-  lbl.className = "node-label";
-  lbl.textContent = (d.city || d.name) + " (" + d.id + ")";
-  el.appendChild(lbl);
-  el.addEventListener("click", function(ev) {
-    ev.stopPropagation();
-    handlePointClick(d);
-  });
-  el.addEventListener("mouseenter", function() {
-    lbl.classList.add("show");
-    if (cityRows[d.id]) cityRows[d.id].classList.add("hl");
-  });
-  el.addEventListener("mouseleave", function() {
-    lbl.classList.remove("show");
-    if (cityRows[d.id]) cityRows[d.id].classList.remove("hl");
-  });
-  nodeEls[d.id] = el;
-  return el;
+/* Arrowhead wingtips of every edge (at its destination), computed once. */
+var wingLpLat = new Float64Array(edgesData.length);
+var wingLpLng = new Float64Array(edgesData.length);
+var wingRpLat = new Float64Array(edgesData.length);
+var wingRpLng = new Float64Array(edgesData.length);
+edgesData.forEach(function(e, i) {
+  var f = nodeMap[e.from], t = nodeMap[e.to];
+  if (!f || !t) return;
+  var rev = calcBearing(f.lat, f.lon, t.lat, t.lon) + 180;
+  var lp = destPoint(t.lat, t.lon, rev + ARROW_SPREAD, ARROW_WING_KM);
+  var rp = destPoint(t.lat, t.lon, rev - ARROW_SPREAD, ARROW_WING_KM);
+  wingLpLat[i] = lp.lat; wingLpLng[i] = lp.lng;
+  wingRpLat[i] = rp.lat; wingRpLng[i] = rp.lng;
+});
+
+/* Selected airports are drawn larger, in a lightened country colour. */
+function nodeColor(d) {
+  if (!activeCities.has(d.id)) return d.color;
+  if (!d._hl) {
+    var r = parseInt(d.color.slice(1,3), 16), g = parseInt(d.color.slice(3,5), 16),
+        b = parseInt(d.color.slice(5,7), 16);
+    d._hl = "rgb(" + ((r + 255) >> 1) + "," + ((g + 255) >> 1) + "," + ((b + 255) >> 1) + ")";
+  }
+  return d._hl;
+}
+
+function nodeRadius(d) {
+  var r = Math.max(0.1, 0.05 + d.size * 0.003);
+  return activeCities.has(d.id) ? r * 1.6 : r;
 }
 
+/* One shared hover label, placed at the cursor or at the airport's
+   projected screen position. */
+var nodeLabel = document.getElementById("node-label");
+var _mouseX = 0, _mouseY = 0;
+function showNodeLabel(d, x, y) {
+  if (!d) { nodeLabel.classList.remove("show"); return; }
+  nodeLabel.textContent = (d.city || d.name) + " (" + d.id + ")";
+  nodeLabel.style.left = x + "px";
+  nodeLabel.style.top = y + "px";
+  nodeLabel.classList.add("show");
+}
+document.getElementById("globeViz").addEventListener("mousemove", function(ev) {
+  _mouseX = ev.clientX;
+  _mouseY = ev.clientY;
+}, {passive: true});
+
 var myGlobe = Globe()
   .globeImageUrl("https://unpkg.com/three-globe/example/img/earth-night.jpg")
   .backgroundImageUrl("https://unpkg.com/three-globe/example/img/night-sky.png")
   .showAtmosphere(true)
   .atmosphereColor("#1a3366")
   .atmosphereAltitude(0.15)
-  .htmlElementsData(nodesData)
-  .htmlLat("lat")
-  .htmlLng("lon")
-  .htmlAltitude(0.002)
-  .htmlElement(createNodeEl)
+  .pointsData(nodesData)
+  .pointLat("lat")
+  .pointLng("lon")
+  .pointColor(nodeColor)
+  .pointRadius(nodeRadius)
+  .pointAltitude(0.002)
+  .pointLabel(function() { return ""; })
   .arcsData([])
   .arcStartLat("startLat")
   .arcStartLng("startLng")
@@ -952,12 +1480,39 @@ var myGlobe = Globe()
   .height(window.innerHeight)
   (document.getElementById("globeViz"));
 
-function nextAvailDate(fromIata, toIata) {
-  var today = new Date().toISOString().slice(0, 10);
-  var dates = availData[fromIata + "-" + toIata] || [];
-  for (var i = 0; i < dates.length; i++) {
-    if (dates[i] >= today) return dates[i];
+/* Today's ISO date and packed yyyymmdd, recomputed at most once a minute. */
+var _todayCache = {t: 0, v: "", n: 0};
+function todayStr() {
+  var n = Date.now();
+  if (n - _todayCache.t > 60000) {
+    _todayCache.v = new Date(n).toISOString().slice(0, 10);
+    _todayCache.n = isoToInt(_todayCache.v);
+    _todayCache.t = n;
   }
+  return _todayCache.v;
+}
+function todayNum() {
+  todayStr();
+  return _todayCache.n;
+}
+
+/* Popup row labels per ISO date, from two shared formatters. */
+var dfDay = new Intl.DateTimeFormat("en-GB", {weekday: "short"});
+var dfDate = new Intl.DateTimeFormat("en-GB", {day: "numeric", month: "short", year: "numeric"});
+var dateFmtCache = Object.create(null);
+function dateLabels(iso) {
+  var c = dateFmtCache[iso];
+  if (!c) {
+    var dd = new Date(iso + "T00:00:00");
+    c = dateFmtCache[iso] = {dayName: dfDay.format(dd), dateLabel: dfDate.format(dd)};
+  }
+  return c;
+}
+
+function nextAvailDate(fromIata, toIata) {
+  var dates = availByPair.get(pairKey(fromIata, toIata)) || NO_DAYS;
+  var i = lbDate(dates, todayNum());
+  if (i < dates.length) return intToIso(dates[i]);
   var d = new Date();
   d.setDate(d.getDate() + 1);
   return d.toISOString().slice(0, 10);
@@ -977,91 +1532,108 @@ function buildAirlineUrl(airline, fromIata, toIata, dateStr) {
     "&destinationIata=" + toIata;
 }
 
+/* Row prototypes for the arc popup, cloned per flight. */
+var apRowTpl = document.createElement("template");
+apRowTpl.innerHTML = '<div class="ap-row"><span class="ap-day"></span>' +
+  '<span class="ap-date"></span><span class="ap-price"></span>' +
+  '<span class="ap-go">\u2192 Book</span></div>';
+var apCurTpl = document.createElement("span");
+apCurTpl.style.cssText = "color:#8b949e;font-size:10px";
+
+function makeApRow(iso) {
+  var row = apRowTpl.content.firstChild.cloneNode(true);
+  var lbl = dateLabels(iso);
+  row.dataset.date = iso;
+  row.children[0].textContent = lbl.dayName;
+  row.children[1].textContent = lbl.dateLabel;
+  return row;
+}
+
 function showArcPopup(arc) {
   if (!arc || !arc.fromIata || !arc.toIata) return;
   var from = arc.fromIata, to = arc.toIata;
   var al = arc.airline || edgeAirlineCode(from, to);
-  var meta = airlineMeta[al] || {name: al, color: "#888"};
+  var ai = airlineIdx[al];
+  var alName = ai === undefined ? al : airlineNameStr[ai];
+  var alColor = ai === undefined ? "#888888" : airlineColorStr[ai];
   var fNode = nodeMap[from], tNode = nodeMap[to];
   var fromLabel = fNode ? (fNode.city || fNode.name) + " (" + from + ")" : from;
   var toLabel = tNode ? (tNode.city || tNode.name) + " (" + to + ")" : to;
 
-  document.getElementById("ap-dot").style.background = meta.color;
+  document.getElementById("ap-dot").style.background = alColor;
   document.getElementById("ap-route").textContent = fromLabel + "  \u2192  " + toLabel;
-  document.getElementById("ap-airline").textContent = meta.name;
+  document.getElementById("ap-airline").textContent = alName;
 
-  var flights = fareByRoute[from + "-" + to] || [];
-  var today = new Date().toISOString().slice(0, 10);
-  flights = flights.filter(function(f) { return f.date >= today && f.price > 0; });
+  var pk = pairKey(from, to);
+  var flights = fareByPair.get(pk) || [];
+  var today = todayNum();
+  flights = flights.filter(function(f) { return fareDay(f) >= today && f.price > 0; });
 
   if (tfEnabled && tfActiveEdges) {
     var start = document.getElementById("tf-start").value;
     var end = document.getElementById("tf-end").value;
     if (start && end) {
-      flights = flights.filter(function(f) { return f.date >= start && f.date <= end; });
+      var startN = isoToInt(start), endN = isoToInt(end);
+      flights = flights.filter(function(f) { return f._dnum >= startN && f._dnum <= endN; });
     }
   }
 
   var body = document.getElementById("arc-popup-body");
-  body.innerHTML = "";
+  var frag = document.createDocumentFragment();
 
   if (flights.length === 0) {
-    var dates = availData[from + "-" + to] || [];
-    dates = dates.filter(function(d) { return d >= today; });
+    var dates = availByPair.get(pk) || NO_DAYS;
+    dates = dates.subarray(lbDate(dates, today));
     if (tfEnabled) {
       var start = document.getElementById("tf-start").value;
       var end = document.getElementById("tf-end").value;
-      if (start && end) dates = dates.filter(function(d) { return d >= start && d <= end; });
+      if (start && end) {
+        dates = dates.subarray(lbDate(dates, isoToInt(start)), lbDate(dates, isoToInt(end) + 1));
+      }
     }
     if (dates.length > 0) {
       dates.forEach(function(dt) {
-        var row = document.createElement("div");
-        row.className = "ap-row";
-        var dd = new Date(dt + "T00:00:00");
-        var dayName = dd.toLocaleDateString("en-GB", {weekday: "short"});
-        var dateLabel = dd.toLocaleDateString("en-GB", {day: "numeric", month: "short", year: "numeric"});
-        row.innerHTML = '<span class="ap-day">' + dayName + '</span>' +
-          '<span class="ap-date">' + dateLabel + '</span>' +
-          '<span class="ap-price" style="color:#8b949e">--</span>' +
-          '<span class="ap-go">\u2192 Book</span>';
-        row.addEventListener("click", function() {
-          window.open(buildAirlineUrl(al, from, to, dt), "_blank");
-        });
-        body.appendChild(row);
+        var row = makeApRow(intToIso(dt));
+        var price = row.children[2];
+        price.style.color = "#8b949e";
+        price.textContent = "--";
+        frag.appendChild(row);
       });
     } else {
-      body.innerHTML = '<div id="arc-popup-empty">No flights found in this time frame</div>';
+      var empty = document.createElement("div");
+      empty.id = "arc-popup-empty";
+      empty.textContent = "No flights found in this time frame";
+      frag.appendChild(empty);
     }
   } else {
     flights.forEach(function(f) {
-      var row = document.createElement("div");
-      row.className = "ap-row";
-      var dd = new Date(f.date + "T00:00:00");
-      var dayName = dd.toLocaleDateString("en-GB", {weekday: "short"});
-      var dateLabel = dd.toLocaleDateString("en-GB", {day: "numeric", month: "short", year: "numeric"});
-      var priceColor = meta.color;
-      var priceStr;
+      var row = makeApRow(f.date);
+      var price = row.children[2];
+      price.style.color = alColor;
       if (f.currency === "EUR") {
-        priceStr = f.price.toFixed(2) + " \u20AC";
+        price.textContent = f.price.toFixed(2) + " \u20AC";
       } else {
-        priceStr = f.eur.toFixed(2) + " \u20AC" +
-          ' <span style="color:#8b949e;font-size:10px">(' +
-          Math.round(f.price) + " " + f.currency + ")</span>";
+        price.textContent = f.eur.toFixed(2) + " \u20AC ";
+        var cur = apCurTpl.cloneNode(false);
+        cur.textContent = "(" + Math.round(f.price) + " " + f.currency + ")";
+        price.appendChild(cur);
       }
-      row.innerHTML = '<span class="ap-day">' + dayName + '</span>' +
-        '<span class="ap-date">' + dateLabel + '</span>' +
-        '<span class="ap-price" style="color:' + priceColor + '">' + priceStr + '</span>' +
-        '<span class="ap-go">\u2192 Book</span>';
-      row.addEventListener("click", function() {
-        window.open(buildAirlineUrl(al, from, to, f.date), "_blank");
-      });
-      body.appendChild(row);
+      frag.appendChild(row);
     });
   }
+  body.replaceChildren(frag);
+  apRoute = {airline: al, from: from, to: to};
 
   document.getElementById("arc-popup-overlay").classList.add("show");
 }
 
+var apRoute = null;
+document.getElementById("arc-popup-body").addEventListener("click", function(ev) {
+  var row = ev.target.closest(".ap-row");
+  if (!row || !apRoute) return;
+  window.open(buildAirlineUrl(apRoute.airline, apRoute.from, apRoute.to, row.dataset.date), "_blank");
+});
+
 document.getElementById("arc-popup-close").addEventListener("click", function() {
   document.getElementById("arc-popup-overlay").classList.remove("show");
 });
@@ -1080,6 +1652,16 @@ myGlobe.onArcHover(function(arc) {
   document.body.style.cursor = arc && arc.fromIata ? "pointer" : "";
 });
 
+var _hoverNode = null;
+myGlobe.onPointClick(handlePointClick);
+myGlobe.onPointHover(function(d) {
+  if (_hoverNode && cityRows[_hoverNode.id]) cityRows[_hoverNode.id].classList.remove("hl");
+  _hoverNode = d;
+  if (d && cityRows[d.id]) cityRows[d.id].classList.add("hl");
+  document.body.style.cursor = d ? "pointer" : "";
+  showNodeLabel(d, _mouseX, _mouseY);
+});
+
 fetch("https://unpkg.com/world-atlas@2/countries-110m.json")
   .then(function(r) { return r.json(); })
   .then(function(world) {
@@ -1090,6 +1672,7 @@ fetch("https://unpkg.com/world-atlas@2/countries-110m.json")
       .polygonSideColor(function() { return "rgba(10,25,50,0.15)"; })
       .polygonStrokeColor(function() { return "rgba(180,210,255,0.5)"; })
       .polygonAltitude(0.001);
+    wakeGlobe();
   });
 
 myGlobe.pointOfView({ lat: 50, lng: 10, altitude: 2.5 }, 0);
@@ -1097,29 +1680,110 @@ myGlobe.pointOfView({ lat: 50, lng: 10, altitude: 2.5 }, 0);
 var ctrl = myGlobe.controls();
 ctrl.autoRotate = true;
 ctrl.autoRotateSpeed = 0.35;
-ctrl.addEventListener("start", function() { ctrl.autoRotate = false; });
+ctrl.addEventListener("start", function() { ctrl.autoRotate = false; _ctrlActive = true; wakeGlobe(); });
+ctrl.addEventListener("end", function() { _ctrlActive = false; wakeGlobe(); });
+
+/* globe.gl re-renders every frame even when nothing moves. Its loop is
+   paused once the globe has been still for GLOBE_IDLE_MS, which is long
+   enough for arc transitions and damping to settle. Auto-rotation, a drag
+   or a data change wakes it up again. */
+var GLOBE_IDLE_MS = 1500;
+var _globeRunning = true, _globeOnScreen = true, _ctrlActive = false;
+var _globeIdleTimer = setTimeout(idleGlobe, GLOBE_IDLE_MS);
+function wakeGlobe(ms) {
+  if (!_globeOnScreen) return;
+  if (!_globeRunning) {
+    _globeRunning = true;
+    myGlobe.resumeAnimation();
+  }
+  clearTimeout(_globeIdleTimer);
+  _globeIdleTimer = setTimeout(idleGlobe, ms || GLOBE_IDLE_MS);
+}
+function idleGlobe() {
+  _globeIdleTimer = 0;
+  if (ctrl.autoRotate || _ctrlActive || !_globeRunning) return;
+  _globeRunning = false;
+  myGlobe.pauseAnimation();
+}
+/* Hover picking runs inside the render loop, so pointer movement over the
+   globe keeps it awake too. */
+document.getElementById("globeViz").addEventListener("pointermove", function() {
+  wakeGlobe();
+}, {passive: true});
 
 var baseArcStroke = 0.2;
 var REF_DIST = 550;
+var cam = myGlobe.camera();
 var _lastStroke = 0;
-var _strokeTimer = null;
+var _lastDistSq = -1, _lastBase = -1;
+var _strokeRaf = 0;
 function getZoomStroke(base) {
-  var d = myGlobe.camera().position.length();
+  var d = cam.position.length();
   return base * (Math.max(d, 50) / REF_DIST);
 }
 function applyZoomStroke() {
+  // Auto-rotation fires "change" every frame without moving the camera
+  // closer or further; skip those before taking a square root.
+  var dsq = cam.position.lengthSq();
+  if (dsq === _lastDistSq && baseArcStroke === _lastBase) return;
+  _lastDistSq = dsq;
+  _lastBase = baseArcStroke;
   var s = getZoomStroke(baseArcStroke);
   if (Math.abs(s - _lastStroke) / (s || 1) < 0.05) return;
   _lastStroke = s;
   myGlobe.arcStroke(s);
+  wakeGlobe();
+}
+/* Arrowheads are left out while a wing would be under WING_MIN_PX on
+   screen; crossing the threshold redraws the arcs. */
+var WING_MIN_PX = 2;
+var GLOBE_RADIUS = 100;
+var _drawWings = wingsVisible();
+function wingsVisible() {
+  var dist = Math.max(cam.position.length() - GLOBE_RADIUS, 1);
+  var fov = (cam.fov || 50) * DEG2RAD;
+  var pxPerUnit = window.innerHeight / (2 * dist * Math.tan(fov / 2));
+  return ARROW_WING_KM / 6371 * GLOBE_RADIUS * pxPerUnit >= WING_MIN_PX;
 }
+function updateWings() {
+  var w = wingsVisible();
+  if (w === _drawWings) return;
+  _drawWings = w;
+  if (pfActive) refreshSelectedPfArcs();
+  else refreshArcs();
+}
+
 ctrl.addEventListener("change", function() {
-  if (_strokeTimer) return;
-  _strokeTimer = setTimeout(function() { _strokeTimer = null; applyZoomStroke(); }, 150);
+  if (_strokeRaf) return;
+  if (!ctrl.autoRotate) wakeGlobe();
+  _strokeRaf = requestAnimationFrame(function() { _strokeRaf = 0; applyZoomStroke(); updateWings(); });
 });
 
+/* Pause rendering and auto-rotation while the globe is scrolled or
+   covered out of view. */
+if ("IntersectionObserver" in window) {
+  var _rotatePaused = false;
+  new IntersectionObserver(function(entries) {
+    var onScreen = entries[entries.length - 1].isIntersecting;
+    if (onScreen === _globeOnScreen) return;
+    _globeOnScreen = onScreen;
+    if (!onScreen) {
+      _rotatePaused = ctrl.autoRotate;
+      ctrl.autoRotate = false;
+      clearTimeout(_globeIdleTimer);
+      if (_globeRunning) myGlobe.pauseAnimation();
+      _globeRunning = false;
+    } else {
+      if (_rotatePaused) ctrl.autoRotate = true;
+      _rotatePaused = false;
+      wakeGlobe();
+    }
+  }).observe(document.getElementById("globeViz"));
+}
+
 window.addEventListener("resize", function() {
   myGlobe.width(window.innerWidth).height(window.innerHeight);
+  wakeGlobe();
 });
 
 /* ---- Selection ---- */
@@ -1132,166 +1796,221 @@ function toggleCity(id) {
   if (activeCities.has(id)) activeCities.delete(id);
   else activeCities.add(id);
   if (pfActive) clearPathfinder();
-  refreshArcs();
-  syncUI();
+  scheduleRefresh(REFRESH_UI, [id]);
 }
 
 function toggleCountry(cc, checked) {
+  var changed = [];
   (countryGroups[cc] || []).forEach(function(c) {
+    if (activeCities.has(c.id) === checked) return;
     if (checked) activeCities.add(c.id);
     else activeCities.delete(c.id);
+    changed.push(c.id);
   });
   if (pfActive) clearPathfinder();
-  refreshArcs();
-  syncUI();
+  scheduleRefresh(REFRESH_UI, changed);
 }
 
 var ARC_ALT_BASE = 0.003;
 var ARC_ALT_OFFSET = 0.012;
 
-function airlineArcColor(code) {
-  var m = airlineMeta[code];
-  return m ? m.color : "#888888";
+/* Arcs currently on the globe, tagged with their edge id in _e. */
+var liveArcs = [];
+var liveEdges = new Set();
+var liveIntersect = false;
+
+function edgeShown(e, intersect) {
+  if (!isEdgeVisible(e)) return false;
+  if (tfEnabled && tfActiveEdges && !tfActiveEdges.has((edgeFrom[e._i] << 16) | edgeTo[e._i])) return false;
+  var a = activeCityBits[edgeFrom[e._i]], b = activeCityBits[edgeTo[e._i]];
+  return intersect ? !!(a && b) : !!(a || b);
 }
 
-function refreshArcs() {
+function pushEdgeArcs(arcs, e) {
+  var f = nodeMap[e.from], t = nodeMap[e.to];
+  if (!f || !t) return false;
+  var start = arcs.length, ei = e._i;
+  var visAirlines = getEdgeInfo(e).visible;
+  var multi = visAirlines.length > 1;
+
+  for (var ai = 0; ai < visAirlines.length; ai++) {
+    var al = visAirlines[ai];
+    var c = airlineColorStr[airlineIdx[al]];
+    var alt = multi ? ARC_ALT_BASE + ai * ARC_ALT_OFFSET : undefined;
+    arcs.push({
+      startLat: f.lat, startLng: f.lon,
+      endLat: t.lat, endLng: t.lon,
+      color: c, alt: alt,
+      fromIata: e.from, toIata: e.to, airline: al
+    });
+    if (!_drawWings) continue;
+    arcs.push({
+      startLat: wingLpLat[ei], startLng: wingLpLng[ei],
+      endLat: t.lat, endLng: t.lon,
+      color: c, alt: alt,
+      fromIata: e.from, toIata: e.to, airline: al
+    });
+    arcs.push({
+      startLat: wingRpLat[ei], startLng: wingRpLng[ei],
+      endLat: t.lat, endLng: t.lon,
+      color: c, alt: alt,
+      fromIata: e.from, toIata: e.to, airline: al
+    });
+  }
+  for (var k = start; k < arcs.length; k++) arcs[k]._e = ei;
+  return true;
+}
+
+/* Rebuild the route arcs. When `changed` lists the cities just toggled,
+   only edges incident to them are re-evaluated; airline, time-frame and
+   intersect-mode changes fall back to a full rebuild. */
+function refreshArcs(changed) {
   if (pfActive) return;
   if (activeCities.size === 0) {
+    liveArcs = [];
+    liveEdges.clear();
+    liveIntersect = false;
     myGlobe.arcsData([]);
+    wakeGlobe();
     return;
   }
-  var arcs = [];
-  edgesData.forEach(function(e) {
-    if (!isEdgeVisible(e)) return;
-    if (tfEnabled && tfActiveEdges && !tfActiveEdges.has(e.from + "-" + e.to)) return;
-    var show;
-    if (intersectMode && activeCities.size >= 2) {
-      show = activeCities.has(e.from) && activeCities.has(e.to);
-    } else {
-      show = activeCities.has(e.from) || activeCities.has(e.to);
-    }
-    if (!show) return;
-    var f = nodeMap[e.from], t = nodeMap[e.to];
-    if (!f || !t) return;
-
-    var visAirlines = (e.airlines || []).filter(function(a) { return activeAirlines.has(a); });
-    var multi = visAirlines.length > 1;
-
-    for (var ai = 0; ai < visAirlines.length; ai++) {
-      var al = visAirlines[ai];
-      var c = airlineArcColor(al);
-      var alt = multi ? ARC_ALT_BASE + ai * ARC_ALT_OFFSET : undefined;
-      arcs.push({
-        startLat: f.lat, startLng: f.lon,
-        endLat: t.lat, endLng: t.lon,
-        color: c, alt: alt,
-        fromIata: e.from, toIata: e.to, airline: al
-      });
-      addArrowArcs(arcs, f.lat, f.lon, t.lat, t.lon, c, alt, e.from, e.to, al);
-    }
-  });
-  myGlobe.arcsData(arcs);
+  var intersect = intersectMode && activeCities.size >= 2;
+  if (changed && intersect === liveIntersect) {
+    var touched = new Set();
+    changed.forEach(function(id) {
+      (edgesByNode[nodeIdx[id]] || []).forEach(function(i) { touched.add(i); });
+    });
+    var added = [], dropped = new Set();
+    touched.forEach(function(i) {
+      var e = edgesData[i];
+      var show = edgeShown(e, intersect);
+      if (show && !liveEdges.has(i)) {
+        if (pushEdgeArcs(added, e)) liveEdges.add(i);
+      } else if (!show && liveEdges.has(i)) {
+        liveEdges.delete(i);
+        dropped.add(i);
+      }
+    });
+    if (!added.length && !dropped.size) return;
+    var kept = dropped.size
+      ? liveArcs.filter(function(a) { return !dropped.has(a._e); })
+      : liveArcs;
+    liveArcs = kept.concat(added);
+  } else {
+    var arcs = [];
+    liveEdges.clear();
+    edgesData.forEach(function(e) {
+      if (edgeShown(e, intersect) && pushEdgeArcs(arcs, e)) liveEdges.add(e._i);
+    });
+    liveArcs = arcs;
+  }
+  liveIntersect = intersect;
+  myGlobe.arcsData(liveArcs);
+  wakeGlobe();
 }
 
 /* ---- Build tree ---- */
 var treeEl = document.getElementById("tree");
+var cgTpl = document.createElement("template");
+cgTpl.innerHTML = '<div class="cg"><div class="cg-hd"><span class="cg-arr">&#9654;</span>' +
+  '<input type="checkbox"><span class="cg-dot"></span><span class="cg-lbl"></span>' +
+  '<span class="cg-cnt"></span></div><div class="cg-cities"></div></div>';
+var ctTpl = document.createElement("template");
+ctTpl.innerHTML = '<div class="ct-row"><input type="checkbox">' +
+  '<span class="ct-iata"></span><span class="ct-name"></span></div>';
+var treeFrag = document.createDocumentFragment();
+var cgEls = [], ctRowEls = [];
 
 Object.keys(countryGroups).sort(function(a, b) {
   return (countryNames[a] || a).localeCompare(countryNames[b] || b);
 }).forEach(function(cc) {
   var cities = countryGroups[cc];
 
-  var g = document.createElement("div");
-  g.className = "cg";
+  var g = cgTpl.content.firstChild.cloneNode(true);
   g.dataset.cc = cc;
+  var hd = g.firstChild;
 
-  var hd = document.createElement("div");
-  hd.className = "cg-hd";
+  hd.children[1].dataset.cc = cc;
+  hd.children[2].style.background = countryColors[cc];
+  hd.children[3].textContent = countryNames[cc] || cc.toUpperCase();
+  hd.children[4].textContent = "(" + cities.length + ")";
 
-  var arrow = document.createElement("span");
-  arrow.className = "cg-arr";
-  arrow.innerHTML = "&#9654;";
-
-  var cb = document.createElement("input");
-  cb.type = "checkbox";
-  cb.dataset.cc = cc;
-
-  var dot = document.createElement("span");
-  dot.className = "cg-dot";
-  dot.style.background = countryColors[cc];
-
-  var lbl = document.createElement("span");
-  lbl.className = "cg-lbl";
-  lbl.textContent = countryNames[cc] || cc.toUpperCase();
-
-  var cnt = document.createElement("span");
-  cnt.className = "cg-cnt";
-  cnt.textContent = "(" + cities.length + ")";
-
-  hd.appendChild(arrow);
-  hd.appendChild(cb);
-  hd.appendChild(dot);
-  hd.appendChild(lbl);
-  hd.appendChild(cnt);
-
-  var cityDiv = document.createElement("div");
-  cityDiv.className = "cg-cities";
-
-  cities.forEach(function(c) {
-    var row = document.createElement("div");
-    row.className = "ct-row";
-
-    var ccb = document.createElement("input");
-    ccb.type = "checkbox";
-    ccb.dataset.id = c.id;
-
-    var iata = document.createElement("span");
-    iata.className = "ct-iata";
-    iata.textContent = c.id;
+  cgEls.push(g);
+  treeFrag.appendChild(g);
+});
+treeEl.appendChild(treeFrag);
+cgEls.slice().sort(function(a, b) {
+  var nameA = (countryNames[a.dataset.cc] || a.dataset.cc).toLowerCase();
+  var nameB = (countryNames[b.dataset.cc] || b.dataset.cc).toLowerCase();
+  return nameA < nameB ? -1 : nameA > nameB ? 1 : 0;
+}).forEach(function(g, i) {
+  g._nameRank = i;
+  g.style.order = cgEls.length + i;
+});
 
-    var nm = document.createElement("span");
-    nm.className = "ct-name";
+/* City rows are only built when a group is first opened, or when its
+   header scrolls into view so opening it is instant. */
+function hydrateGroup(g) {
+  if (g._hydrated) return;
+  g._hydrated = true;
+  if (treeObserver) treeObserver.unobserve(g);
+  var frag = document.createDocumentFragment();
+  (countryGroups[g.dataset.cc] || []).forEach(function(c) {
+    var row = ctTpl.content.firstChild.cloneNode(true);
+    row.dataset.id = c.id;
+    row.children[0].dataset.id = c.id;
+    row.children[0].checked = activeCities.has(c.id);
+    row.children[1].textContent = c.id;
+    var nm = row.children[2];
     nm.textContent = c.city || c.name;
     nm.title = c.name + " - " + (outDeg[c.id] || 0) + " out / " + (inDeg[c.id] || 0) + " in";
-
-    row.appendChild(ccb);
-    row.appendChild(iata);
-    row.appendChild(nm);
-
-    ccb.addEventListener("click", function(ev) { ev.stopPropagation(); toggleCity(c.id); });
-    row.addEventListener("click", function(ev) {
-      if (ev.target.type === "checkbox") return;
-      toggleCity(c.id);
-    });
-    row.addEventListener("mouseenter", function() {
-      var el = nodeEls[c.id];
-      if (el) el.querySelector(".node-label").classList.add("show");
-    });
-    row.addEventListener("mouseleave", function() {
-      var el = nodeEls[c.id];
-      if (el) el.querySelector(".node-label").classList.remove("show");
-    });
+    if (airlineVersion && !isNodeVisible(c.id)) row.style.display = "none";
     cityRows[c.id] = row;
-
-    cityDiv.appendChild(row);
+    ctRowEls.push(row);
+    frag.appendChild(row);
   });
+  g.lastChild.appendChild(frag);
+}
 
-  cb.addEventListener("click", function(ev) {
-    ev.stopPropagation();
-    toggleCountry(cc, this.checked);
-    if (this.checked && !g.classList.contains("open")) g.classList.add("open");
-  });
+function setGroupOpen(g, open) {
+  if (open) hydrateGroup(g);
+  g.classList.toggle("open", open);
+}
 
-  hd.addEventListener("click", function(ev) {
-    if (ev.target.type === "checkbox") return;
-    g.classList.toggle("open");
-  });
+var treeObserver = null;
+if ("IntersectionObserver" in window) {
+  treeObserver = new IntersectionObserver(function(entries) {
+    entries.forEach(function(en) { if (en.isIntersecting) hydrateGroup(en.target); });
+  }, {root: document.getElementById("tree-wrap"), rootMargin: "200px 0px"});
+  cgEls.forEach(function(g) { treeObserver.observe(g); });
+}
 
-  g.appendChild(hd);
-  g.appendChild(cityDiv);
-  treeEl.appendChild(g);
+/* Tree events are delegated from #tree via data-id / data-cc. */
+treeEl.addEventListener("click", function(ev) {
+  var row = ev.target.closest(".ct-row");
+  if (row) { toggleCity(row.dataset.id); return; }
+  var hd = ev.target.closest(".cg-hd");
+  if (!hd) return;
+  var g = hd.parentNode;
+  if (ev.target.type === "checkbox") {
+    toggleCountry(g.dataset.cc, ev.target.checked);
+    if (ev.target.checked) setGroupOpen(g, true);
+  } else {
+    setGroupOpen(g, !g.classList.contains("open"));
+  }
 });
 
+function showTreeLabel(ev, on) {
+  var row = ev.target.closest(".ct-row");
+  if (!row || (ev.relatedTarget && row.contains(ev.relatedTarget))) return;
+  var d = nodeMap[row.dataset.id];
+  if (!on || !d || !isNodeVisible(d.id)) { showNodeLabel(null); return; }
+  var p = myGlobe.getScreenCoords(d.lat, d.lon, 0.002);
+  showNodeLabel(d, p.x, p.y);
+}
+treeEl.addEventListener("mouseover", function(ev) { showTreeLabel(ev, true); });
+treeEl.addEventListener("mouseout", function(ev) { showTreeLabel(ev, false); });
+
 /* ---- Airline panel ---- */
 (function() {
   var listEl = document.getElementById("airline-list");
@@ -1324,50 +2043,78 @@ Object.keys(countryGroups).sort(function(a, b) {
     listEl.appendChild(row);
 
     cb.addEventListener("change", function() {
-      if (this.checked) activeAirlines.add(code);
-      else activeAirlines.delete(code);
+      setAirlineActive(code, this.checked);
       applyAirlineFilter();
     });
   });
 })();
 
 function applyAirlineFilter() {
+  if (pfActive) clearPathfinder();
+  scheduleRefresh(REFRESH_NODES | REFRESH_ADJ | REFRESH_ARCS | REFRESH_UI);
+}
+
+var visibleNodes = nodesData;
+var _pointsSelVer = 0;
+
+function updateNodeVisibility() {
   // Update node visibility on globe
-  var visibleNodes = nodesData.filter(function(n) { return isNodeVisible(n.id); });
-  myGlobe.htmlElementsData(visibleNodes);
-
-  // Update tree: show/hide city rows and country groups
-  document.querySelectorAll(".ct-row").forEach(function(row) {
-    var cb = row.querySelector("input[type='checkbox']");
-    var id = cb ? cb.dataset.id : null;
-    if (id) {
-      row.style.display = isNodeVisible(id) ? "" : "none";
-      if (!isNodeVisible(id) && activeCities.has(id)) {
-        activeCities.delete(id);
-      }
-    }
-  });
+  visibleNodes = nodesData.filter(function(n) { return isNodeVisible(n.id); });
+  myGlobe.pointsData(visibleNodes);
+  wakeGlobe();
+  _pointsSelVer = activeCities.version;
 
-  document.querySelectorAll(".cg").forEach(function(g) {
+  // Update tree: drop hidden cities, show/hide built rows and groups
+  cgEls.forEach(function(g) {
     var cc = g.dataset.cc;
-    var cities = countryGroups[cc] || [];
-    var visCount = 0;
-    cities.forEach(function(c) { if (isNodeVisible(c.id)) visCount++; });
+    if ((ccSelected[cc] || 0) === (ccSelVisible[cc] || 0)) return;
+    countryGroups[cc].forEach(function(c) {
+      if (activeCities.has(c.id) && !isNodeVisible(c.id)) activeCities.delete(c.id);
+    });
+  });
+  ctRowEls.forEach(function(row) {
+    row.style.display = isNodeVisible(row.dataset.id) ? "" : "none";
+  });
+
+  cgEls.forEach(function(g) {
+    var visCount = ccVisible[g.dataset.cc] || 0;
     g.style.display = visCount > 0 ? "" : "none";
-    var cntEl = g.querySelector(".cg-cnt");
-    if (cntEl) cntEl.textContent = "(" + visCount + ")";
+    g.querySelector(".cg-cnt").textContent = "(" + visCount + ")";
   });
 
   // Update stats line
-  var visEdges = edgesData.filter(function(e) { return isEdgeVisible(e); });
   document.querySelector(".stat").innerHTML =
-    "Airports: <b>" + visibleNodes.length + "</b> &middot; Routes: <b>" + visEdges.length + "</b>";
+    "Airports: <b>" + visibleNodeCount + "</b> &middot; Routes: <b>" + visibleEdgeCount + "</b>";
+}
 
-  adjOut = buildAdjOut();
+/* ---- Deferred refresh ----
+   Bursts of city/airline toggles are coalesced into one update per frame;
+   each step runs at most once per flush. */
+var REFRESH_ARCS = 1, REFRESH_UI = 2, REFRESH_NODES = 4, REFRESH_ADJ = 8;
+var REFRESH_CITY_ARCS = 16;
+var _pending = 0;
+var _pendingCities = [];
+
+function scheduleRefresh(flags, cities) {
+  if (cities) {
+    _pendingCities.push.apply(_pendingCities, cities);
+    flags |= REFRESH_CITY_ARCS;
+  }
+  var idle = !_pending;
+  _pending |= flags;
+  if (idle) requestAnimationFrame(flushRefresh);
+}
 
-  if (pfActive) clearPathfinder();
-  refreshArcs();
-  syncUI();
+function flushRefresh() {
+  var f = _pending, cities = _pendingCities;
+  if (!f) return;
+  _pending = 0;
+  _pendingCities = [];
+  if (f & REFRESH_NODES) updateNodeVisibility();
+  if (f & REFRESH_ADJ) pfGraph = null;
+  if (f & REFRESH_ARCS) refreshArcs();
+  else if (f & REFRESH_CITY_ARCS) refreshArcs(cities);
+  if (f & REFRESH_UI) syncUI();
 }
 
 /* ---- Intersection toggle ---- */
@@ -1386,16 +2133,14 @@ function tfWeekLater(dateStr) {
 }
 
 (function() {
-  var today = new Date().toISOString().slice(0, 10);
+  var today = todayStr();
   document.getElementById("tf-start").value = today;
   document.getElementById("tf-end").value = tfWeekLater(today);
 
-  var dates = Object.values(availData).flat();
-  if (dates.length) {
-    dates.sort();
+  if (availFirst !== null) {
     document.getElementById("tf-status").textContent =
-      "Data available: " + dates[0] + " to " + dates[dates.length - 1] +
-      " (" + Object.keys(availData).length + " routes)";
+      "Data available: " + availFirst + " to " + availLast +
+      " (" + availKeys.length + " routes)";
   } else {
     document.getElementById("tf-status").textContent = "No availability data.";
   }
@@ -1430,17 +2175,15 @@ function applyTimeFrame() {
     return;
   }
   tfEnabled = true;
+  var startN = isoToInt(start), endN = isoToInt(end);
   var activeRoutes = new Set();
-  Object.keys(availData).forEach(function(routeKey) {
-    var days = availData[routeKey];
-    for (var i = 0; i < days.length; i++) {
-      if (days[i] >= start && days[i] <= end) {
-        activeRoutes.add(routeKey);
-        break;
-      }
-    }
-  });
+  for (var r = 0; r < availPairs.length; r++) {
+    var days = availByPair.get(availPairs[r]);
+    var i = lbDate(days, startN);
+    if (i < days.length && days[i] <= endN) activeRoutes.add(availPairs[r]);
+  }
   tfActiveEdges = activeRoutes;
+  pfGraph = null;
   document.getElementById("tf-status").textContent =
     activeRoutes.size + " routes with flights between " + start + " and " + end;
   document.getElementById("tf-status").style.color = "#3fb950";
@@ -1452,15 +2195,14 @@ function applyTimeFrame() {
 function clearTimeFrame() {
   tfEnabled = false;
   tfActiveEdges = null;
-  var today = new Date().toISOString().slice(0, 10);
+  pfGraph = null;
+  var today = todayStr();
   document.getElementById("tf-start").value = today;
   document.getElementById("tf-end").value = tfWeekLater(today);
-  var dates = Object.values(availData).flat();
-  if (dates.length) {
-    dates.sort();
+  if (availFirst !== null) {
     document.getElementById("tf-status").textContent =
-      "Data available: " + dates[0] + " to " + dates[dates.length - 1] +
-      " (" + Object.keys(availData).length + " routes)";
+      "Data available: " + availFirst + " to " + availLast +
+      " (" + availKeys.length + " routes)";
   } else {
     document.getElementById("tf-status").textContent = "";
   }
@@ -1474,45 +2216,15 @@ document.getElementById("tf-search-btn").addEventListener("click", applyTimeFram
 document.getElementById("tf-clear-btn").addEventListener("click", clearTimeFrame);
 
 /* ---- Sync UI ---- */
-function reorderCountries() {
-  var tree = document.getElementById("tree");
-  var groups = Array.from(tree.querySelectorAll(".cg"));
-  groups.sort(function(a, b) {
-    var ccA = a.dataset.cc, ccB = b.dataset.cc;
-    var citiesA = countryGroups[ccA] || [], citiesB = countryGroups[ccB] || [];
-    var selA = 0, selB = 0;
-    citiesA.forEach(function(c) { if (activeCities.has(c.id)) selA++; });
-    citiesB.forEach(function(c) { if (activeCities.has(c.id)) selB++; });
-    var hasA = selA > 0 ? 0 : 1;
-    var hasB = selB > 0 ? 0 : 1;
-    if (hasA !== hasB) return hasA - hasB;
-    var nameA = (countryNames[ccA] || ccA).toLowerCase();
-    var nameB = (countryNames[ccB] || ccB).toLowerCase();
-    return nameA < nameB ? -1 : nameA > nameB ? 1 : 0;
-  });
-  groups.forEach(function(g) {
-    tree.appendChild(g);
-    var cc = g.dataset.cc;
-    var cities = countryGroups[cc] || [];
-    var hasSel = cities.some(function(c) { return activeCities.has(c.id); });
-    if (hasSel) g.classList.add("open");
-    else g.classList.remove("open");
-  });
-}
-
 function syncUI() {
   document.querySelectorAll(".ct-row input[type='checkbox']").forEach(function(cb) {
     cb.checked = activeCities.has(cb.dataset.id);
   });
 
   var totalVisible = 0, totalSelected = 0;
-  document.querySelectorAll(".cg-hd input[type='checkbox']").forEach(function(cb) {
-    var cc = cb.dataset.cc;
-    var cities = countryGroups[cc] || [];
-    var vis = 0, sel = 0;
-    cities.forEach(function(c) {
-      if (isNodeVisible(c.id)) { vis++; if (activeCities.has(c.id)) sel++; }
-    });
+  cgEls.forEach(function(g) {
+    var cb = g.firstChild.children[1];
+    var vis = ccVisible[g.dataset.cc] || 0, sel = ccSelVisible[g.dataset.cc] || 0;
     totalVisible += vis;
     totalSelected += sel;
     cb.checked = sel === vis && vis > 0;
@@ -1522,13 +2234,20 @@ function syncUI() {
   sacb.checked = totalSelected === totalVisible && totalVisible > 0;
   sacb.indeterminate = totalSelected > 0 && totalSelected < totalVisible;
 
-  reorderCountries();
-
-  Object.keys(nodeEls).forEach(function(id) {
-    nodeEls[id].style.boxShadow = activeCities.has(id)
-      ? "0 0 5px 2px " + nodeMap[id].color : "none";
+  // Countries with a selection float to the top via CSS order.
+  var nGroups = cgEls.length;
+  cgEls.forEach(function(g) {
+    var hasSel = (ccSelected[g.dataset.cc] || 0) > 0;
+    g.style.order = (hasSel ? 0 : nGroups) + g._nameRank;
+    setGroupOpen(g, hasSel);
   });
 
+  if (_pointsSelVer !== activeCities.version) {
+    _pointsSelVer = activeCities.version;
+    myGlobe.pointsData(visibleNodes.slice());
+    wakeGlobe();
+  }
+
   var icb = document.getElementById("intersect-cb");
   var ilbl = document.getElementById("filter-label");
   if (activeCities.size >= 2) {
@@ -1541,7 +2260,8 @@ function syncUI() {
 
   var s = document.getElementById("status");
   if (activeCities.size > 0) {
-    var arcN = myGlobe.arcsData().length;
+    // Every drawn route arc carries two wing arcs when arrowheads are on.
+    var arcN = myGlobe.arcsData().length / (_drawWings ? 3 : 1);
     s.textContent = activeCities.size + " cities, " + arcN + " routes" +
       (intersectMode && activeCities.size >= 2 ? " (shared only)" : "");
   } else {
@@ -1550,29 +2270,71 @@ function syncUI() {
 }
 
 /* ---- Pathfinder ---- */
-function buildAdjOut() {
-  var adj = {};
+/* Pathfinder adjacency as CSR over node indices, from the visible and
+   time-frame-filtered edges. Neighbours keep edgesData order with repeats
+   dropped. Rebuilt lazily after airline or time-frame changes. */
+function buildPfGraph() {
+  var N = nodesArr.length;
+  var tf = tfEnabled && tfActiveEdges;
+  var srcs = [], dsts = [];
   edgesData.forEach(function(e) {
     if (!isEdgeVisible(e)) return;
-    if (!adj[e.from]) adj[e.from] = [];
-    adj[e.from].push(e.to);
-    if (!adj[e.to]) adj[e.to] = [];
-    adj[e.to].push(e.from);
+    var a = edgeFrom[e._i], b = edgeTo[e._i];
+    if (!tf || tfActiveEdges.has((a << 16) | b)) { srcs.push(a); dsts.push(b); }
+    if (!tf || tfActiveEdges.has((b << 16) | a)) { srcs.push(b); dsts.push(a); }
   });
-  return adj;
+  var start = new Int32Array(N + 1);
+  for (var i = 0; i < srcs.length; i++) start[srcs[i] + 1]++;
+  for (var n = 0; n < N; n++) start[n + 1] += start[n];
+  var fill = start.slice(0, N);
+  var nb = new Int32Array(srcs.length);
+  for (i = 0; i < srcs.length; i++) nb[fill[srcs[i]]++] = dsts[i];
+
+  var adjOff = new Int32Array(N + 1);
+  var mark = new Int32Array(N).fill(-1);
+  var w = 0;
+  for (n = 0; n < N; n++) {
+    adjOff[n] = w;
+    for (var p = start[n]; p < start[n + 1]; p++) {
+      if (mark[nb[p]] === n) continue;
+      mark[nb[p]] = n;
+      nb[w++] = nb[p];
+    }
+  }
+  adjOff[N] = w;
+  return {adjOff: adjOff, adjNb: nb.slice(0, w)};
 }
-var adjOut = buildAdjOut();
+var pfGraph = null;
 
 var pfActive = false;
 var pfResults = [];
+var pfMaxLen = 0;  // longest path in pfResults, in airports
 var pfHitLimit = false;
 var pfHighlight = -1;
-var pfSelectedPaths = [];
+/* Selected paths keyed by pathKey(), in selection order. */
+var pfSelectedPathMap = new Map();
+
+/* "A>B>C" key for a result path, cached on the (never mutated) array. */
+function pathKey(p) {
+  return p._key || (p._key = p.join(">"));
+}
 
 var _pfRunning = false;
+var pfWorker = null;
+var _pfWorkerUrl = null;
+
+/* The DFS runs in a worker built from the inline #pf-worker-src block. */
+function pfWorkerUrl() {
+  if (!_pfWorkerUrl) {
+    var src = document.getElementById("pf-worker-src").textContent;
+    _pfWorkerUrl = URL.createObjectURL(new Blob([src], {type: "text/javascript"}));
+  }
+  return _pfWorkerUrl;
+}
 
 function runPathfinder() {
   if (_pfRunning) return;
+  flushRefresh();
   var isCycle = document.querySelector('input[name="pf-mode"]:checked').value === "cycles";
   var onlySelected = document.getElementById("pf-only-selected").checked;
   var nList = isCycle ? [3, 4, 5, 6, 7, 8] : [1, 2, 3, 4, 5, 6, 7, 8];
@@ -1582,42 +2344,20 @@ function runPathfinder() {
   var progressBar = document.getElementById("pf-progress-bar");
   var label = isCycle ? "cycle" : "path";
 
-  var pfAdj = {};
-  edgesData.forEach(function(e) {
-    if (!isEdgeVisible(e)) return;
-    if (tfEnabled && tfActiveEdges) {
-      if (tfActiveEdges.has(e.from + "-" + e.to)) {
-        if (!pfAdj[e.from]) pfAdj[e.from] = [];
-        pfAdj[e.from].push(e.to);
-      }
-      if (tfActiveEdges.has(e.to + "-" + e.from)) {
-        if (!pfAdj[e.to]) pfAdj[e.to] = [];
-        pfAdj[e.to].push(e.from);
-      }
-    } else {
-      if (!pfAdj[e.from]) pfAdj[e.from] = [];
-      pfAdj[e.from].push(e.to);
-      if (!pfAdj[e.to]) pfAdj[e.to] = [];
-      pfAdj[e.to].push(e.from);
-    }
-  });
-
   if (activeCities.size < (isCycle ? 1 : 2)) {
     statusEl.textContent = isCycle ? "Select at least 1 city first" : "Select at least 2 cities first";
     resultsEl.innerHTML = "";
     return;
   }
 
-  Object.keys(pfAdj).forEach(function(k) {
-    var u = {}; var deduped = [];
-    pfAdj[k].forEach(function(v) { if (!u[v]) { u[v] = true; deduped.push(v); } });
-    pfAdj[k] = deduped;
-  });
+  if (!pfGraph) pfGraph = buildPfGraph();
+  var N = nodesArr.length;
 
-  var selected = Array.from(activeCities);
-  var selectedSet = activeCities;
+  var selected = activeCities.indices();
+  var selMask = new Uint8Array(N);
+  selected.forEach(function(i) { selMask[i] = 1; });
   var results = [];
-  var seen = {};
+  var maxLen = 0;
 
   _pfRunning = true;
   progressEl.classList.add("active");
@@ -1627,132 +2367,115 @@ function runPathfinder() {
 
   var totalSteps = nList.length * selected.length;
   var stepsDone = 0;
+  var found = 0;
 
   function updateProgress() {
     var pct = Math.min(100, Math.round(stepsDone / totalSteps * 100));
     progressBar.style.width = pct + "%";
-    statusEl.textContent = "Searching ... " + results.length + " " + label + (results.length !== 1 ? "s" : "") + " found";
-  }
-
-  function dfsFromStart(start, n) {
-    var _count = 0;
-    function dfs(node, path, vis) {
-      if (++_count > 50000) return;
-      var hops = path.length - 1;
-
-      if (hops === n) {
-        if (!isCycle && selectedSet.has(node) && node !== start) {
-          var key = path.join(">");
-          if (!seen[key]) { seen[key] = true; results.push(path.slice()); }
-        }
-        return;
-      }
-
-      var nb = pfAdj[node] || [];
-      for (var i = 0; i < nb.length; i++) {
-        var next = nb[i];
-        if (onlySelected && !selectedSet.has(next)) continue;
-        if (next === start && isCycle) {
-          if (hops === n - 1) {
-            path.push(next);
-            var key = path.slice().sort().join(">");
-            if (!seen[key]) { seen[key] = true; results.push(path.slice()); }
-            path.pop();
-          }
-          continue;
-        }
-        if (vis[next]) continue;
-        vis[next] = true;
-        path.push(next);
-        dfs(next, path, vis);
-        path.pop();
-        vis[next] = false;
-      }
-    }
-    var vis = {};
-    vis[start] = true;
-    dfs(start, [start], vis);
-  }
-
-  var li = 0, si = 0;
-
-  function processBatch() {
-    var batchStart = Date.now();
-    while (li < nList.length) {
-      while (si < selected.length) {
-        dfsFromStart(selected[si], nList[li]);
-        si++;
-        stepsDone++;
-        if (Date.now() - batchStart > 80) {
-          updateProgress();
-          setTimeout(processBatch, 0);
-          return;
-        }
-      }
-      si = 0;
-      li++;
-    }
+    statusEl.textContent = "Searching ... " + found + " " + label + (found !== 1 ? "s" : "") + " found";
+  }
+
+  var worker = pfWorker = new Worker(pfWorkerUrl());
+  worker.onmessage = function(ev) {
+    var m = ev.data;
+    if (worker !== pfWorker) return;
+    stepsDone = m.steps;
+    found = m.found;
+    if (m.type === "progress") { updateProgress(); return; }
+    worker.terminate();
+    pfWorker = null;
+    results = m.results.map(function(p) {
+      if (p.length > maxLen) maxLen = p.length;
+      return p.map(function(i) { return nodeIds[i]; });
+    });
     finishSearch();
-  }
+  };
+  worker.onerror = function(ev) {
+    worker.terminate();
+    if (worker !== pfWorker) return;
+    pfWorker = null;
+    _pfRunning = false;
+    progressEl.classList.remove("active");
+    statusEl.textContent = "ERROR: " + ev.message;
+  };
+  worker.postMessage({
+    adjOff: pfGraph.adjOff, adjNb: pfGraph.adjNb, selected: selected, selMask: selMask,
+    nList: nList, isCycle: isCycle, onlySelected: onlySelected
+  }, [selMask.buffer]);
 
   function finishSearch() {
     _pfRunning = false;
     progressBar.style.width = "100%";
     setTimeout(function() { progressEl.classList.remove("active"); }, 400);
     pfResults = results;
+    pfMaxLen = maxLen;
     pfHitLimit = false;
     pfActive = true;
     pfHighlight = -1;
     renderPfResults();
   }
-
-  setTimeout(processBatch, 0);
 }
 
 function refreshSelectedPfArcs() {
-  if (pfSelectedPaths.length > 0) {
-    showPfArcs(pfSelectedPaths);
-  } else {
-    myGlobe.arcsData([]);
-  }
+  showPfArcs(Array.from(pfSelectedPathMap.values()));
 }
 
-function togglePfPath(path, row) {
-  var key = path.join(">");
-  var idx = -1;
-  for (var i = 0; i < pfSelectedPaths.length; i++) {
-    if (pfSelectedPaths[i].join(">") === key) { idx = i; break; }
-  }
-  if (idx >= 0) {
-    pfSelectedPaths.splice(idx, 1);
-    row.classList.remove("selected");
-  } else {
-    pfSelectedPaths.push(path);
-    row.classList.add("selected");
-  }
+/* Rendered result rows by pathKey. Selection changes update the row, its
+   checkbox and its group header in place rather than re-rendering. */
+var _pfRowByKey = new Map();
+
+function setPfPathSelected(path, sel) {
+  var key = pathKey(path);
+  if (sel === pfSelectedPathMap.has(key)) return;
+  if (sel) pfSelectedPathMap.set(key, path);
+  else pfSelectedPathMap.delete(key);
+  var row = _pfRowByKey.get(key);
+  if (!row) return;
+  row.classList.toggle("selected", sel);
+  row.firstChild.checked = sel;
+  var g = row._grp;
+  g.sel += sel ? 1 : -1;
+  g.cb.checked = g.sel === g.total;
+}
+
+function togglePfPath(path) {
+  setPfPathSelected(path, !pfSelectedPathMap.has(pathKey(path)));
   refreshSelectedPfArcs();
 }
 
 var pfHopFilters = [];
+/* Distinct airports at each path position, sorted by display name. */
+var pfCandidatesByPos = [];
 
 function cityName(id) {
-  var nd = nodeMap[id];
-  return nd ? (nd.city || nd.name) : id;
+  return cityNameMap[id] || id;
 }
 
 function buildHopFilter() {
   var box = document.getElementById("pf-hop-filter");
-  box.innerHTML = "";
   pfHopFilters = [];
-  if (pfResults.length === 0) { box.classList.remove("active"); return; }
+  pfCandidatesByPos = [];
+  if (pfResults.length === 0) {
+    box.replaceChildren();
+    box.classList.remove("active");
+    return;
+  }
 
-  var maxLen = 0;
-  pfResults.forEach(function(p) { if (p.length > maxLen) maxLen = p.length; });
+  var maxLen = pfMaxLen;
+  var byPos = [];
+  for (var i = 0; i < maxLen; i++) byPos.push(new Set());
+  pfResults.forEach(function(p) {
+    for (var i = 0; i < p.length; i++) byPos[i].add(p[i]);
+  });
+  pfCandidatesByPos = byPos.map(function(set) {
+    return Array.from(set).sort(function(a, b) {
+      return nameCollator.compare(cityName(a), cityName(b));
+    });
+  });
 
   box.classList.add("active");
   var bar = document.createElement("div");
   bar.id = "pf-hop-bar";
-  box.appendChild(bar);
 
   for (var i = 0; i < maxLen; i++) {
     if (i > 0) {
@@ -1809,9 +2532,9 @@ function buildHopFilter() {
         renderPfResultsList();
       }
 
-      inp.addEventListener("input", function() {
+      inp.addEventListener("input", rafDebounce(function() {
         showHopSuggestions(hopData, inp.value.trim().toLowerCase(), suggest);
-      });
+      }));
       inp.addEventListener("focus", function() {
         showHopSuggestions(hopData, inp.value.trim().toLowerCase(), suggest);
       });
@@ -1830,31 +2553,30 @@ function buildHopFilter() {
       hopData.addTag = addTag;
     })(i);
   }
+  box.replaceChildren(bar);
 }
 
 function showHopSuggestions(hopData, query, suggestEl) {
-  suggestEl.innerHTML = "";
   var pos = hopData.pos;
   var existing = {};
   hopData.ids.forEach(function(id) { existing[id] = true; });
 
-  var cities = {};
-  pfResults.forEach(function(p) {
-    if (pos < p.length && !existing[p[pos]]) cities[p[pos]] = true;
-  });
-  var ids = Object.keys(cities).sort(function(a, b) {
-    return cityName(a).localeCompare(cityName(b));
-  });
+  var ids = (pfCandidatesByPos[pos] || []).filter(function(id) { return !existing[id]; });
   if (query) {
+    // Airports outside nodesData are not indexed and are checked directly.
+    var hit = new Set(subCandidates(query));
     ids = ids.filter(function(id) {
-      return cityName(id).toLowerCase().indexOf(query) >= 0 ||
-             id.toLowerCase().indexOf(query) >= 0;
+      if (nodeMap[id] && !hit.has(nodeIdx[id])) return false;
+      var idLC = cityIdLC[id] || id.toLowerCase();
+      return (cityNameLC[id] || idLC).indexOf(query) >= 0 || idLC.indexOf(query) >= 0;
     });
   }
   if (ids.length === 0) {
+    suggestEl.replaceChildren();
     suggestEl.classList.remove("show");
     return;
   }
+  var frag = document.createDocumentFragment();
   ids.slice(0, 30).forEach(function(id) {
     var opt = document.createElement("div");
     opt.className = "pf-hop-opt";
@@ -1864,8 +2586,9 @@ function showHopSuggestions(hopData, query, suggestEl) {
       hopData.addTag(id);
       suggestEl.classList.remove("show");
     });
-    suggestEl.appendChild(opt);
+    frag.appendChild(opt);
   });
+  suggestEl.replaceChildren(frag);
   suggestEl.classList.add("show");
 }
 
@@ -1886,7 +2609,26 @@ function renderPfResults() {
   renderPfResultsList();
 }
 
+var PF_GROUP_OPEN_MAX = 50;
+
+/* Builds a result group's rows, once. */
+function hydratePfGroup(grp) {
+  var state = grp._state;
+  if (state.built) return;
+  state.built = true;
+  var bodyFrag = document.createDocumentFragment();
+  state.paths.forEach(function(path) {
+    var r = makePfRow(path);
+    r._grp = state;
+    _pfRowByKey.set(pathKey(path), r);
+    bodyFrag.appendChild(r);
+  });
+  grp.lastChild.appendChild(bodyFrag);
+}
+
 function renderPfResultsList() {
+  syncPathCostCache();
+  _pfRowByKey.clear();
   var statusEl = document.getElementById("pf-status");
   var resultsEl = document.getElementById("pf-results");
   var isCycle = document.querySelector('input[name="pf-mode"]:checked').value === "cycles";
@@ -1925,25 +2667,25 @@ function renderPfResultsList() {
   if (total < pfResults.length) txt += " (of " + pfResults.length + " total)";
   statusEl.textContent = txt;
 
-  var selKeys = {};
-  pfSelectedPaths.forEach(function(p) { selKeys[p.join(">")] = true; });
-
-  resultsEl.innerHTML = "";
+  var frag = document.createDocumentFragment();
 
   function pathLabel(p) {
-    return p.map(function(id) { return cityName(id); }).join(" -> ");
+    return p.map(cityName).join(" -> ");
   }
 
   lengths.forEach(function(n) {
-    groups[n].sort(function(a, b) {
-      var ca = pathCostEur(a), cb = pathCostEur(b);
-      var va = ca ? ca.total : Infinity, vb = cb ? cb.total : Infinity;
-      if (va !== vb) return va - vb;
-      return pathLabel(a).localeCompare(pathLabel(b));
+    // Cheapest first, then by label; keys are computed once per path.
+    var decorated = groups[n].map(function(p) {
+      var c = pathCostEur(p);
+      return {p: p, v: c ? c.total : Infinity, lbl: pathLabel(p)};
     });
+    decorated.sort(function(a, b) {
+      return a.v !== b.v ? a.v - b.v : nameCollator.compare(a.lbl, b.lbl);
+    });
+    var grpPaths = decorated.map(function(d) { return d.p; });
 
     var grp = document.createElement("div");
-    grp.className = "pf-grp open";
+    grp.className = "pf-grp";
 
     var hd = document.createElement("div");
     hd.className = "pf-grp-hd";
@@ -1952,9 +2694,9 @@ function renderPfResultsList() {
     arr.innerHTML = "&#9654;";
     var gcb = document.createElement("input");
     gcb.type = "checkbox";
-    var grpPaths = groups[n];
-    var allSel = grpPaths.every(function(p) { return selKeys[p.join(">")]; });
-    gcb.checked = allSel;
+    var grpState = {cb: gcb, paths: grpPaths, total: grpPaths.length, sel: 0, built: false};
+    grpPaths.forEach(function(p) { if (pfSelectedPathMap.has(pathKey(p))) grpState.sel++; });
+    gcb.checked = grpState.sel === grpState.total;
     var hdLbl = document.createElement("span");
     hdLbl.textContent = "Length " + n + " (" + grpPaths.length + ")";
     hd.appendChild(arr);
@@ -1963,81 +2705,91 @@ function renderPfResultsList() {
 
     var body = document.createElement("div");
     body.className = "pf-grp-body";
-    var rowEls = [];
-    grpPaths.forEach(function(path) {
-      var r = makePfRow(path, selKeys);
-      body.appendChild(r);
-      rowEls.push(r);
-    });
-
-    gcb.addEventListener("click", function(ev) { ev.stopPropagation(); });
-    gcb.addEventListener("change", function() {
-      grpPaths.forEach(function(path, i) {
-        var key = path.join(">");
-        var idx = -1;
-        for (var j = 0; j < pfSelectedPaths.length; j++) {
-          if (pfSelectedPaths[j].join(">") === key) { idx = j; break; }
-        }
-        if (gcb.checked && idx < 0) {
-          pfSelectedPaths.push(path);
-          rowEls[i].classList.add("selected");
-          rowEls[i].querySelector("input").checked = true;
-        } else if (!gcb.checked && idx >= 0) {
-          pfSelectedPaths.splice(idx, 1);
-          rowEls[i].classList.remove("selected");
-          rowEls[i].querySelector("input").checked = false;
-        }
-      });
-      refreshSelectedPfArcs();
-    });
-
-    arr.addEventListener("click", function(ev) {
-      ev.stopPropagation();
-      grp.classList.toggle("open");
-    });
-    hdLbl.addEventListener("click", function(ev) {
-      ev.stopPropagation();
-      grp.classList.toggle("open");
-    });
 
+    grp._state = grpState;
     grp.appendChild(hd);
     grp.appendChild(body);
-    resultsEl.appendChild(grp);
+    // Large groups start collapsed and build their rows on first open.
+    if (grpPaths.length <= PF_GROUP_OPEN_MAX) {
+      hydratePfGroup(grp);
+      grp.classList.add("open");
+    }
+    frag.appendChild(grp);
   });
+  resultsEl.replaceChildren(frag);
 
   refreshSelectedPfArcs();
 }
 
+/* Path costs and cheapest leg fares (-1 when none) for the current date
+   window, keyed by path and by route pair. The window is read once per
+   render; both caches are dropped whenever it changes. */
+var _pathCostCache = new Map();
+var _legBestCache = new Map();
+var _pathCostKey = "";
+var _pathCostToday = 0, _pathCostStart = 0, _pathCostEnd = 0;
+function syncPathCostCache() {
+  var today = todayNum();
+  var start = tfEnabled ? document.getElementById("tf-start").value : "";
+  var end = tfEnabled ? document.getElementById("tf-end").value : "";
+  var key = today + "|" + start + "|" + end;
+  if (key === _pathCostKey) return;
+  _pathCostKey = key;
+  _pathCostCache.clear();
+  _legBestCache.clear();
+  _pathCostToday = today;
+  _pathCostStart = start ? isoToInt(start) : 0;
+  _pathCostEnd = end ? isoToInt(end) : 0;
+}
+
+function legBestEur(pk) {
+  if (pk === null) return -1;
+  var best = _legBestCache.get(pk);
+  if (best !== undefined) return best;
+  var today = _pathCostToday, tfStart = _pathCostStart, tfEnd = _pathCostEnd;
+  var flights = fareByPair.get(pk) || [];
+  best = -1;
+  for (var j = 0; j < flights.length; j++) {
+    var f = flights[j];
+    var day = fareDay(f);
+    if (day < today) continue;
+    if (tfStart && day < tfStart) continue;
+    if (tfEnd && day > tfEnd) continue;
+    if (f.price <= 0 || f.eur <= 0) continue;
+    if (best < 0 || f.eur < best) best = f.eur;
+  }
+  _legBestCache.set(pk, best);
+  return best;
+}
+
 function pathCostEur(path) {
+  var ck = pathKey(path);
+  var hit = _pathCostCache.get(ck);
+  if (hit !== undefined) return hit;
   var total = 0;
   var allKnown = true;
-  var today = new Date().toISOString().slice(0, 10);
-  var tfStart = tfEnabled ? document.getElementById("tf-start").value : null;
-  var tfEnd = tfEnabled ? document.getElementById("tf-end").value : null;
   for (var i = 0; i < path.length - 1; i++) {
-    var key = path[i] + "-" + path[i + 1];
-    var flights = fareByRoute[key] || [];
-    var best = null;
-    for (var j = 0; j < flights.length; j++) {
-      var f = flights[j];
-      if (f.date < today) continue;
-      if (tfStart && f.date < tfStart) continue;
-      if (tfEnd && f.date > tfEnd) continue;
-      if (f.price <= 0 || f.eur <= 0) continue;
-      if (best === null || f.eur < best) best = f.eur;
-    }
-    if (best === null) { allKnown = false; }
+    var best = legBestEur(pairKey(path[i], path[i + 1]));
+    if (best < 0) { allKnown = false; }
     else { total += best; }
   }
-  if (!allKnown && total === 0) return null;
-  return {total: Math.round(total * 100) / 100, partial: !allKnown};
+  var res = !allKnown && total === 0 ? null :
+    {total: Math.round(total * 100) / 100, partial: !allKnown};
+  _pathCostCache.set(ck, res);
+  return res;
 }
 
-function makePfRow(path, selKeys) {
+/* Label pieces for pathfinder rows, cloned per hop. */
+var pfSepTpl = document.createElement("span");
+pfSepTpl.textContent = " \u2192 ";
+pfSepTpl.style.fontWeight = "bold";
+var pfCityTpl = document.createElement("span");
+
+function makePfRow(path) {
   var row = document.createElement("div");
   row.className = "pf-row";
-  var key = path.join(">");
-  var isSel = selKeys && selKeys[key];
+  var key = pathKey(path);
+  var isSel = pfSelectedPathMap.has(key);
   if (isSel) row.classList.add("selected");
 
   var cb = document.createElement("input");
@@ -2058,80 +2810,163 @@ function makePfRow(path, selKeys) {
   var lbl = document.createElement("span");
   lbl.className = "pf-row-lbl";
   row.title = path.join(" -> ") + " (" + (path.length - 1) + " hops)";
+  var lblFrag = document.createDocumentFragment();
   for (var pi = 0; pi < path.length; pi++) {
     if (pi > 0) {
-      var sep = document.createElement("span");
-      sep.textContent = " \u2192 ";
+      var sep = pfSepTpl.cloneNode(true);
       sep.style.color = edgeAirlineColor(path[pi - 1], path[pi]);
-      sep.style.fontWeight = "bold";
-      lbl.appendChild(sep);
+      lblFrag.appendChild(sep);
     }
-    var citySpan = document.createElement("span");
-    var nd = nodeMap[path[pi]];
-    citySpan.textContent = nd ? (nd.city || nd.name) : path[pi];
-    lbl.appendChild(citySpan);
+    var citySpan = pfCityTpl.cloneNode(false);
+    citySpan.textContent = cityName(path[pi]);
+    lblFrag.appendChild(citySpan);
   }
+  lbl.appendChild(lblFrag);
 
   row.appendChild(cb);
   row.appendChild(costSpan);
   row.appendChild(lbl);
+  row._path = path;
+  return row;
+}
 
-  function doToggle() {
-    var wasSelected = row.classList.contains("selected");
-    togglePfPath(path, row);
-    cb.checked = !wasSelected;
+/* Result rows and group headers share delegated listeners on #pf-results.
+   Rows carry their path in _path; groups carry their state in _state. */
+var pfResultsEl = document.getElementById("pf-results");
+pfResultsEl.addEventListener("change", function(ev) {
+  var t = ev.target;
+  if (t.tagName !== "INPUT") return;
+  var row = t.closest(".pf-row");
+  if (row) { togglePfPath(row._path); return; }
+  var hd = t.closest(".pf-grp-hd");
+  if (!hd) return;
+  var sel = t.checked, state = hd.parentNode._state;
+  state.paths.forEach(function(path) { setPfPathSelected(path, sel); });
+  state.sel = sel ? state.total : 0;  // rows of an unbuilt group are not counted
+  refreshSelectedPfArcs();
+});
+pfResultsEl.addEventListener("click", function(ev) {
+  var t = ev.target;
+  if (t.closest(".pf-row-lbl")) {
+    togglePfPath(t.closest(".pf-row")._path);
+    return;
+  }
+  var hd = t.closest(".pf-grp-hd");
+  if (hd && (t === hd.children[0] || t === hd.children[2])) {
+    hydratePfGroup(hd.parentNode);
+    hd.parentNode.classList.toggle("open");
+  }
+});
+pfResultsEl.addEventListener("mouseover", function(ev) {
+  var row = ev.target.closest(".pf-row");
+  if (!row || row.contains(ev.relatedTarget)) return;
+  if (!row.classList.contains("selected")) {
+    showPfArcs([row._path].concat(Array.from(pfSelectedPathMap.values())));
+    row.classList.add("on");
   }
+});
+pfResultsEl.addEventListener("mouseout", function(ev) {
+  var row = ev.target.closest(".pf-row");
+  if (!row || row.contains(ev.relatedTarget)) return;
+  row.classList.remove("on");
+  refreshSelectedPfArcs();
+});
 
-  cb.addEventListener("click", function(ev) { ev.stopPropagation(); });
-  cb.addEventListener("change", function() { doToggle(); });
-  lbl.addEventListener("click", function(ev) {
-    ev.stopPropagation();
-    doToggle();
-  });
-  row.addEventListener("mouseenter", function() {
-    if (!row.classList.contains("selected")) {
-      showPfArcs([path].concat(pfSelectedPaths));
-      row.classList.add("on");
-    }
-  });
-  row.addEventListener("mouseleave", function() {
-    row.classList.remove("on");
-    refreshSelectedPfArcs();
-  });
-  return row;
+/* Pathfinder arc objects per route pair: the leg arc plus its arrowhead
+   wings (built on first use). Reused across redraws until the airline
+   filter changes, since that can change the leg's colour. */
+var pfArcCache = new Map();
+var pfArcCacheVer = -1;
+function pfLegArcs(from, to) {
+  if (pfArcCacheVer !== airlineVersion) {
+    pfArcCache.clear();
+    pfArcCacheVer = airlineVersion;
+  }
+  var pk = pairKey(from, to);
+  if (pk === null) return null;
+  var leg = pfArcCache.get(pk);
+  if (leg !== undefined) return leg;
+  var f = nodeMap[from], t = nodeMap[to];
+  leg = null;
+  if (f && t) {
+    leg = {arc: {
+      startLat: f.lat, startLng: f.lon,
+      endLat: t.lat, endLng: t.lon,
+      color: edgeAirlineColor(from, to), alt: undefined,
+      fromIata: from, toIata: to, airline: edgeAirlineCode(from, to)
+    }, wings: null};
+  }
+  pfArcCache.set(pk, leg);
+  return leg;
 }
 
+/* Pathfinder arcs are drawn at most once per frame, so sweeping the mouse
+   across result rows only draws the last hovered set. */
+var _pendingPfPaths = null;
+var _pfArcsRaf = 0;
 function showPfArcs(paths) {
+  _pendingPfPaths = paths;
+  if (_pfArcsRaf) return;
+  _pfArcsRaf = requestAnimationFrame(function() {
+    var p = _pendingPfPaths;
+    _pfArcsRaf = 0;
+    _pendingPfPaths = null;
+    showPfArcsImmediate(p);
+  });
+}
+
+function cancelPfArcs() {
+  if (_pfArcsRaf) cancelAnimationFrame(_pfArcsRaf);
+  _pfArcsRaf = 0;
+  _pendingPfPaths = null;
+}
+
+function showPfArcsImmediate(paths) {
+  if (!paths.length) {
+    myGlobe.arcsData([]);
+    wakeGlobe();
+    return;
+  }
   baseArcStroke = 0.4;
   applyZoomStroke();
   var arcs = [];
+  var seen = new Set();  // legs shared by several paths are drawn once
   paths.forEach(function(path) {
     for (var i = 0; i < path.length - 1; i++) {
-      var from = path[i], to = path[i + 1];
-      var f = nodeMap[from], t = nodeMap[to];
-      if (!f || !t) continue;
-      var c = edgeAirlineColor(from, to);
-      var al = edgeAirlineCode(from, to);
-      arcs.push({
-        startLat: f.lat, startLng: f.lon,
-        endLat: t.lat, endLng: t.lon,
-        color: c, alt: undefined,
-        fromIata: from, toIata: to, airline: al
-      });
-      addArrowArcs(arcs, f.lat, f.lon, t.lat, t.lon, c, undefined, from, to, al);
+      var leg = pfLegArcs(path[i], path[i + 1]);
+      if (!leg || seen.has(leg)) continue;
+      seen.add(leg);
+      arcs.push(leg.arc);
+      if (!_drawWings) continue;
+      if (!leg.wings) {
+        var a = leg.arc;
+        leg.wings = [];
+        addArrowArcs(leg.wings, a.startLat, a.startLng, a.endLat, a.endLng,
+                     a.color, undefined, a.fromIata, a.toIata, a.airline);
+      }
+      arcs.push(leg.wings[0], leg.wings[1]);
     }
   });
   myGlobe.arcsData(arcs);
+  wakeGlobe();
 }
 
 function clearPathfinder() {
+  if (pfWorker) { pfWorker.terminate(); pfWorker = null; }
   _pfRunning = false;
   pfActive = false;
   pfResults = [];
+  pfMaxLen = 0;
   pfHitLimit = false;
   pfHighlight = -1;
-  pfSelectedPaths = [];
+  pfSelectedPathMap.clear();
   pfHopFilters = [];
+  pfCandidatesByPos = [];
+  _pathCostCache.clear();
+  _legBestCache.clear();
+  pfArcCache.clear();
+  _pfRowByKey.clear();
+  cancelPfArcs();
   document.getElementById("pf-hop-filter").innerHTML = "";
   document.getElementById("pf-hop-filter").classList.remove("active");
   document.getElementById("pf-progress").classList.remove("active");
@@ -2146,10 +2981,24 @@ function clearPathfinder() {
 var searchBox = document.getElementById("search");
 var suggestionsEl = document.getElementById("suggestions");
 
-searchBox.addEventListener("input", function() {
-  var q = this.value.trim().toLowerCase();
+/* Runs fn at most once per animation frame, with the latest arguments. */
+function rafDebounce(fn) {
+  var pending = false, lastArgs;
+  return function() {
+    lastArgs = arguments;
+    if (pending) return;
+    pending = true;
+    requestAnimationFrame(function() {
+      pending = false;
+      fn.apply(null, lastArgs);
+    });
+  };
+}
+
+searchBox.addEventListener("input", rafDebounce(function() {
+  var q = searchBox.value.trim().toLowerCase();
   if (!q) { suggestionsEl.style.display = "none"; return; }
-  suggestionsEl.innerHTML = "";
+  var frag = document.createDocumentFragment();
 
   var countryHits = Object.keys(countryGroups).filter(function(cc) {
     var name = (countryNames[cc] || "").toLowerCase();
@@ -2166,7 +3015,7 @@ searchBox.addEventListener("input", function() {
     el.onmousedown = function(ev) { ev.preventDefault(); };
     el.onclick = function() {
       visCities.forEach(function(c) { activeCities.add(c.id); });
-      refreshArcs();
+      refreshArcs(visCities.map(function(c) { return c.id; }));
       syncUI();
       suggestionsEl.style.display = "none";
       searchBox.value = "";
@@ -2177,14 +3026,17 @@ searchBox.addEventListener("input", function() {
         }, 80);
       }
     };
-    suggestionsEl.appendChild(el);
+    frag.appendChild(el);
   });
 
-  var cityHits = nodesData.filter(function(n) {
-    return n.id.toLowerCase().indexOf(q) !== -1 ||
-           (n.name || "").toLowerCase().indexOf(q) !== -1 ||
-           (n.city || "").toLowerCase().indexOf(q) !== -1;
-  }).slice(0, 8);
+  var cityHits = [];
+  var cand = subCandidates(q);
+  for (var ci = 0; ci < cand.length && cityHits.length < 8; ci++) {
+    var n = nodesData[cand[ci]];
+    if (cityIdLC[n.id].indexOf(q) !== -1 ||
+        (n.name || "").toLowerCase().indexOf(q) !== -1 ||
+        (n.city || "").toLowerCase().indexOf(q) !== -1) cityHits.push(n);
+  }
   cityHits.forEach(function(n) {
     var el = document.createElement("div");
     el.className = "sug";
@@ -2193,9 +3045,10 @@ searchBox.addEventListener("input", function() {
     el.onmousedown = function(ev) { ev.preventDefault(); };
     el.onclick = function() {
       if (!activeCities.has(n.id)) activeCities.add(n.id);
-      refreshArcs();
+      refreshArcs([n.id]);
       syncUI();
       myGlobe.pointOfView({ lat: n.lat, lng: n.lon, altitude: 1.8 }, 800);
+      wakeGlobe();
       suggestionsEl.style.display = "none";
       searchBox.value = "";
       var row = cityRows[n.id];
@@ -2207,15 +3060,16 @@ searchBox.addEventListener("input", function() {
         }, 80);
       }
     };
-    suggestionsEl.appendChild(el);
+    frag.appendChild(el);
   });
 
+  suggestionsEl.replaceChildren(frag);
   if (suggestionsEl.children.length === 0) {
     suggestionsEl.style.display = "none";
   } else {
     suggestionsEl.style.display = "block";
   }
-});
+}));
 
 searchBox.addEventListener("blur", function() {
   setTimeout(function() { suggestionsEl.style.display = "none"; }, 150);
@@ -2233,6 +3087,7 @@ function resetView() {
   myGlobe.pointOfView({ lat: 50, lng: 10, altitude: 2.5 }, 800);
   searchBox.value = "";
   ctrl.autoRotate = true;
+  wakeGlobe();
 }
 
 function clearAll() {
@@ -2278,10 +3133,136 @@ document.getElementById("select-all-cb").addEventListener("change", function() {
   });
 })();
 </script>
+<script type="text/x-worker" id="pf-worker-src">
+/* Pathfinder search. Receives the visible network as CSR adjacency over
+   node indices and posts progress, then all paths/cycles found. */
+self.onmessage = function(ev) {
+  var m = ev.data;
+  var adjOff = m.adjOff, adjNb = m.adjNb, selMask = m.selMask;
+  var selected = m.selected, nList = m.nList;
+  var isCycle = m.isCycle, onlySelected = m.onlySelected;
+  var vis = new Uint8Array(adjOff.length - 1);
+  var results = [];
+  /* A simple path is reached once per (start, length), so only cycles need
+     deduping: a cycle and its reverse share the same sorted interior nodes,
+     packed 16 bits each into a BigInt key. */
+  var seen = new Set();
+
+  function cycleKey(path) {
+    var inner = path.slice(1, -1).sort(function(a, b) { return a - b; });
+    var key = 0n;
+    for (var i = 0; i < inner.length; i++) key = (key << 16n) | BigInt(inner[i]);
+    return key;
+  }
+
+  function dfsFromStart(start, n) {
+    var _count = 0;
+    function dfs(node, path) {
+      if (++_count > 50000) return;
+      var hops = path.length - 1;
+
+      if (hops === n) {
+        if (!isCycle && selMask[node] && node !== start) results.push(path.slice());
+        return;
+      }
+
+      for (var p = adjOff[node], q = adjOff[node + 1]; p < q; p++) {
+        var next = adjNb[p];
+        if (onlySelected && !selMask[next]) continue;
+        if (next === start && isCycle) {
+          if (hops === n - 1) {
+            path.push(next);
+            var key = cycleKey(path);
+            if (!seen.has(key)) { seen.add(key); results.push(path.slice()); }
+            path.pop();
+          }
+          continue;
+        }
+        if (vis[next]) continue;
+        vis[next] = 1;
+        path.push(next);
+        dfs(next, path);
+        path.pop();
+        vis[next] = 0;
+      }
+    }
+    seen.clear();
+    vis[start] = 1;
+    dfs(start, [start]);
+    vis[start] = 0;
+  }
+
+  var steps = 0, lastPost = Date.now();
+  for (var li = 0; li < nList.length; li++) {
+    for (var si = 0; si < selected.length; si++) {
+      dfsFromStart(selected[si], nList[li]);
+      steps++;
+      if (Date.now() - lastPost > 80) {
+        lastPost = Date.now();
+        self.postMessage({type: "progress", steps: steps, found: results.length});
+      }
+    }
+  }
+  self.postMessage({type: "done", steps: steps, found: results.length, results: results});
+};
+</script>
+<script>
+(function() {
+  function inflateJson(b64) {
+    var bin = atob(b64);
+    var bytes = new Uint8Array(bin.length);
+    for (var i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+    var stream = new Blob([bytes]).stream()
+      .pipeThrough(new DecompressionStream("gzip"));
+    return new Response(stream).json();
+  }
+  function showLoadError(msg) {
+    var el = document.createElement("div");
+    el.style.cssText = "position:fixed;top:50%;left:50%;transform:translate(-50%,-50%);" +
+      "z-index:3000;max-width:420px;padding:16px 20px;background:rgba(22,27,34,0.96);" +
+      "border:1px solid #f85149;border-radius:8px;color:#c9d1d9;font-size:13px;";
+    el.textContent = msg;
+    document.body.appendChild(el);
+  }
+  if (typeof DecompressionStream === "undefined") {
+    showLoadError("This browser cannot load the route data (DecompressionStream " +
+      "is not supported). Please open the page in a current version of " +
+      "Chrome, Edge, Firefox or Safari.");
+    return;
+  }
+  var names = Object.keys(_payloads);
+  Promise.all(names.map(function(k) { return inflateJson(_payloads[k]); }))
+    .then(function(values) {
+      names.forEach(function(k, i) { _payloads[k] = values[i]; });
+      var app = document.createElement("script");
+      app.textContent = document.getElementById("app-src").textContent;
+      document.body.appendChild(app);
+    })
+    .catch(function(err) {
+      console.error(err);
+      showLoadError("Could not load the route data: " + (err && err.message || err));
+    });
+})();
+</script>
 </body>
 </html>
 """
 
+# _TEMPLATE split around its placeholders: even indices are literal HTML
+# (pre-encoded to UTF-8), odd indices are placeholder names.
+_PLACEHOLDERS = (
+    "__NODES__", "__EDGES__", "__LEGEND__", "__NODE_COUNT__",
+    "__EDGE_COUNT__", "__AVAIL__", "__AIRLINE_META__", "__FARE_DATA__",
+)
+# Large payloads embedded gzip-compressed; the page inflates them with
+# DecompressionStream before starting the app script.
+_GZIP_PAYLOADS = {"__NODES__", "__EDGES__", "__AVAIL__", "__FARE_DATA__"}
+_TEMPLATE_PARTS = [
+    part if i % 2 else part.encode("utf-8")
+    for i, part in enumerate(
+        re.split("(" + "|".join(_PLACEHOLDERS) + ")", _TEMPLATE))
+]
+
 
 if __name__ == "__main__":
     from src.config import OUTPUT_DIR, setup_logging